@@ -0,0 +1,47 @@
+import time
+from typing import Dict
+
+from backend.server.db.redis_client import KEY_PREFIX, get_redis
+from backend.server.config.config import Config
+
+
+def revoked_key(jti: str) -> str:
+    return f"{KEY_PREFIX}:jti:{jti}"
+
+
+class TokenDenylist:
+    """Revoked token ids, kept until the token would have expired anyway.
+
+    Revocations are held in memory, and in Redis too when shared so a token
+    revoked on one worker is refused by all of them.
+    """
+
+    def __init__(self, shared: bool):
+        self.shared = shared
+        # jti -> epoch seconds the token expires at
+        self._revoked: Dict[str, float] = {}
+
+    async def revoke(self, jti: str, expires_at: float):
+        now = time.time()
+        self._prune(now)
+        ttl = int(expires_at - now) + 1
+        if ttl <= 0:
+            return
+        self._revoked[jti] = expires_at
+        if self.shared:
+            await get_redis().set(revoked_key(jti), 1, ex=ttl)
+
+    async def is_revoked(self, jti: str) -> bool:
+        expires_at = self._revoked.get(jti)
+        if expires_at is not None and expires_at > time.time():
+            return True
+        if self.shared:
+            return bool(await get_redis().exists(revoked_key(jti)))
+        return False
+
+    def _prune(self, now: float):
+        for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[jti]
+
+
+token_denylist = TokenDenylist(shared=Config.AUTH_DENYLIST_SHARED)
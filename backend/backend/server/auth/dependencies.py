@@ -0,0 +1,13 @@
+from fastapi import Depends, HTTPException, Request
+from sqlmodel import Session
+
+from backend.server.db.db import get_session
+from backend.server.model.model import User
+
+
+def current_user(request: Request, session: Session = Depends(get_session)) -> User:
+    """The caller's full User row, loaded only by routes that need more than request.state.user"""
+    user = session.get(User, request.state.user.id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
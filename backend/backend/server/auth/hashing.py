@@ -0,0 +1,101 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from backend.server.config.config import Config
+from backend.server.metrics.metrics import registry
+
+T = TypeVar("T")
+
+HASH_SECONDS = registry.histogram(
+    "auth_password_hash_seconds",
+    "Time spent hashing or verifying one password",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    labels=("op",),
+)
+HASH_WAIT_SECONDS = registry.histogram(
+    "auth_password_hash_wait_seconds",
+    "Time a password hash waited for a free worker",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+HASH_REJECTED = registry.counter(
+    "auth_password_hash_rejected",
+    "Password hashes refused because the queue was full",
+)
+
+# Pinning min and max to the default flags every hash made with another cost,
+# so it is replaced on the user's next login.
+password_context = CryptContext(
+    schemes=["bcrypt"],
+    bcrypt__default_rounds=Config.AUTH_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=Config.AUTH_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=Config.AUTH_BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a few worker threads so it never blocks the event loop.
+
+    bcrypt releases the GIL while it works, so threads run hashes in parallel.
+    Past max_pending queued hashes new ones are refused with a 503 rather than
+    letting a login spike queue up without bound.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_pending: int):
+        self.context = context
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hash: str) -> bool:
+        return await self._run("verify", self.context.verify, password, hash)
+
+    async def verify_and_update(self, password: str, hash: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password, and return a new hash if the stored one used another cost"""
+        return await self._run("verify", self.context.verify_and_update, password, hash)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, op: str, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            HASH_REJECTED.inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Too many logins right now, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        queued = time.perf_counter()
+
+        def timed() -> T:
+            started = time.perf_counter()
+            HASH_WAIT_SECONDS.observe(started - queued)
+            try:
+                return fn(*args)
+            finally:
+                HASH_SECONDS.observe(time.perf_counter() - started, op)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.pending -= 1
+
+
+password_hasher = PasswordHasher(
+    password_context,
+    workers=Config.AUTH_HASH_WORKERS,
+    max_pending=Config.AUTH_HASH_MAX_PENDING,
+)
+
+registry.gauge(
+    "auth_password_hash_queue",
+    "Password hashes running or waiting for a worker",
+    lambda: {(): password_hasher.pending},
+)
@@ -3,8 +3,11 @@ from fastapi.responses import JSONResponse
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from backend.server.auth.util import verify_hash, generate_token
-from backend.server.model.model import UserCreate, UserLogin,UserBase
+from backend.server.auth.util import generate_token, decode_token
+from backend.server.auth.denylist import token_denylist
+from backend.server.auth.user_cache import user_cache
+from backend.server.auth.hashing import password_hasher
+from backend.server.model.model import UserCreate, UserLogin,UserBase,TokenRefresh
 from backend.server.db.db import get_session
 from backend.server.user.service import UserService
 
@@ -40,7 +43,13 @@ async def user_signin(user_data: UserLogin, session : AsyncSession = Depends(get
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User doesnt exists, try signup')
     
     
-    if verify_hash(user_data.password, is_User.hashed_password):
+    verified, new_hash = await password_hasher.verify_and_update(user_data.password, is_User.hashed_password)
+    if verified:
+        if new_hash is not None:
+            # Stored with another work factor, rehash it while we have the password
+            is_User.hashed_password = new_hash
+            session.add(is_User)
+            session.commit()
         
         access_token = generate_token(
             user_data = {
@@ -74,4 +83,49 @@ async def user_signin(user_data: UserLogin, session : AsyncSession = Depends(get
                 }
             }
         )
-    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Details are wrong')
\ No newline at end of file
+    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Details are wrong')
+
+
+async def _refresh_claims(refresh_token: str) -> dict:
+    """Decoded claims of a live refresh token, or a 401"""
+    token_data = decode_token(refresh_token)
+    if not token_data or not token_data.get('refresh') or not token_data.get('jti'):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid refresh token')
+    if await token_denylist.is_revoked(token_data['jti']):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Refresh token revoked')
+    return token_data
+
+
+@auth_router.post('/refresh', status_code=status.HTTP_200_OK)
+async def refresh_access_token(data: TokenRefresh):
+    token_data = await _refresh_claims(data.refresh_token)
+    claims = token_data.get('user') or {}
+
+    # Deleted users can't refresh; this is a cache hit for anyone active
+    user = await user_cache.get(claims['user_id']) if claims.get('user_id') else None
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found')
+
+    # From the current user, not the refresh token, which may predate a profile update
+    access_token = generate_token(
+        user_data={
+            'email': user.email,
+            'username': user.username,
+            'user_id': user.id
+        }
+    )
+
+    return JSONResponse(
+        content={
+            'message': 'Token refreshed',
+            'access-token': access_token
+        }
+    )
+
+
+@auth_router.post('/logout', status_code=status.HTTP_200_OK)
+async def user_logout(data: TokenRefresh):
+    token_data = await _refresh_claims(data.refresh_token)
+    await token_denylist.revoke(token_data['jti'], token_data['exp'])
+
+    return JSONResponse(content={'message': 'Logged out'})
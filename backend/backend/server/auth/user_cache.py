@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+from sqlmodel import Session
+
+from backend.server.db.db import engine
+from backend.server.db.redis_client import KEY_PREFIX, get_redis
+from backend.server.db.single_flight import SingleFlight
+from backend.server.model.model import User
+from backend.server.config.config import Config
+
+INVALIDATE_CHANNEL = f"{KEY_PREFIX}:user:invalidate"
+
+
+def user_key(user_id: str) -> str:
+    return f"{KEY_PREFIX}:user:{user_id}"
+
+
+class AuthUser(NamedTuple):
+    """The fields of a user requests need once authenticated, without an ORM instance"""
+    id: str
+    username: str
+    email: str
+    is_active: Optional[bool]
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "AuthUser":
+        # Tokens don't carry is_active, so it stays unknown
+        return cls(
+            id=claims["user_id"],
+            username=claims.get("username"),
+            email=claims.get("email"),
+            is_active=None,
+        )
+
+
+def _load_user(user_id: str) -> Optional[AuthUser]:
+    with Session(bind=engine) as session:
+        user = session.get(User, user_id)
+        if user is None:
+            return None
+        return AuthUser(id=user.id, username=user.username, email=user.email, is_active=user.is_active)
+
+
+class UserCache:
+    """Bounded LRU+TTL cache of authenticated users, so most requests skip the database.
+
+    With shared=True entries also live in Redis, and invalidations are published
+    so every worker drops its local copy, not just the one that made the change.
+    """
+
+    def __init__(self, max_size: int, ttl: float, shared: bool):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[float, AuthUser]]" = OrderedDict()
+        # One load per user at a time, however many requests arrive at once
+        self._loading = SingleFlight()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.shared:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def get(self, user_id: str) -> Optional[AuthUser]:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[1]
+            del self._entries[user_id]
+
+        return await self._loading.do(user_id, lambda: self._load(user_id))
+
+    async def invalidate(self, user_id: str):
+        """Forget a user everywhere after it was changed or deleted"""
+        self._entries.pop(user_id, None)
+        if not self.shared:
+            return
+        try:
+            redis = get_redis()
+            await redis.delete(user_key(user_id))
+            await redis.publish(INVALIDATE_CHANNEL, user_id)
+        except Exception as e:
+            # Other workers still drop their copy once the TTL runs out
+            print(f"Error invalidating cached user {user_id}: {str(e)}")
+
+    def _store(self, user_id: str, user: AuthUser):
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _load(self, user_id: str) -> Optional[AuthUser]:
+        if self.shared:
+            try:
+                cached = await get_redis().get(user_key(user_id))
+                if cached is not None:
+                    user = AuthUser(*json.loads(cached))
+                    self._store(user_id, user)
+                    return user
+            except Exception as e:
+                print(f"Error reading cached user {user_id}: {str(e)}")
+
+        user = await asyncio.to_thread(_load_user, user_id)
+        if user is None:
+            return None
+        self._store(user_id, user)
+        if self.shared:
+            try:
+                await get_redis().set(user_key(user_id), json.dumps(user), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                print(f"Error caching user {user_id}: {str(e)}")
+        return user
+
+    async def _listen(self):
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self._entries.pop(message["data"], None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"User cache listener error: {str(e)}")
+                # Anything published while disconnected was missed
+                self._entries.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+user_cache = UserCache(
+    max_size=Config.AUTH_USER_CACHE_SIZE,
+    ttl=Config.AUTH_USER_CACHE_TTL,
+    shared=Config.AUTH_USER_CACHE_SHARED,
+)
@@ -1,7 +1,7 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jwt import encode, decode, PyJWTError
 from backend.server.config.config import Config
+from backend.server.auth.hashing import password_hasher
 import uuid
 import logging
 
@@ -11,18 +11,14 @@ from botocore.exceptions import ClientError
 
 
 
-  
-password_context = CryptContext(
-    schemes=['bcrypt']
-)
 
 ACCESS_TOKEN_EXPIRY = 3600
 
-def generate_hash(password: str) -> str:
-    return password_context.hash(password)
+async def generate_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
-def verify_hash(password: str, hash: str) -> bool:
-    return password_context.verify(password, hash)
+async def verify_hash(password: str, hash: str) -> bool:
+    return await password_hasher.verify(password, hash)
 
 def generate_token(user_data: dict, expiry: timedelta = None, refresh: bool = False):
     payload = {}
@@ -11,8 +11,107 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL : str
     CELERY_RESULT_BACKEND: str 
     
+    # Database pool: at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections per process,
+    # recycled after DB_POOL_RECYCLE seconds; queries are cancelled by Postgres after
+    # DB_STATEMENT_TIMEOUT_MS (0 turns that off). DB_ECHO logs every statement.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_ECHO: bool = False
+    
+    # Websocket fan-out
+    WS_SEND_TIMEOUT: float = 5.0
+    WS_QUEUE_HIGH_WATER: int = 256
+    WS_ROOM_CACHE_TTL: float = 30.0
+    
+    # Admission control: joins past these caps, or while the event loop lags
+    # more than WS_LOOP_LAG_THRESHOLD seconds, are refused with a retry-after hint
+    WS_MAX_CONNECTIONS: int = 100000
+    WS_MAX_ROOM_CONNECTIONS: int = 10000
+    WS_LOOP_LAG_THRESHOLD: float = 0.1
+    WS_LOOP_LAG_INTERVAL: float = 0.5
+    WS_ADMISSION_RETRY_AFTER: int = 5
+    
+    # Shutdown drain: sockets are closed in batches of WS_DRAIN_BATCH_SIZE spread over
+    # WS_DRAIN_WINDOW seconds, clients wait up to WS_DRAIN_RECONNECT_JITTER to come back
+    WS_DRAIN_WINDOW: float = 10.0
+    WS_DRAIN_BATCH_SIZE: int = 500
+    WS_DRAIN_RECONNECT_JITTER: float = 5.0
+    
+    # Heartbeats: clients silent for WS_HEARTBEAT_TIMEOUT are evicted
+    WS_HEARTBEAT_INTERVAL: float = 15.0
+    WS_HEARTBEAT_TIMEOUT: float = 45.0
+    WS_REAPER_BATCH_SIZE: int = 500
+    
+    # Presence: joins/leaves are batched per window, big rooms only get a viewer count
+    WS_PRESENCE_WINDOW: float = 0.25
+    WS_PRESENCE_BROADCAST_THRESHOLD: int = 200
+    
+    # Reactions are counted per room and sent as totals once per tick
+    WS_REACTION_TICK: float = 0.2
+    
+    # Per-room replay buffer for reconnecting clients
+    WS_EVENT_LOG_MAX_EVENTS: int = 100
+    WS_EVENT_LOG_MAX_BYTES: int = 262144
+    
+    # Rate limits in events per second, with the burst allowed on top
+    WS_CHAT_RATE: float = 1.0
+    WS_CHAT_BURST: int = 5
+    WS_CONTROL_RATE: float = 5.0
+    WS_CONTROL_BURST: int = 10
+    WS_ROOM_CHAT_RATE: float = 20.0
+    WS_ROOM_CHAT_BURST: int = 50
+    WS_ROOM_CONTROL_RATE: float = 5.0
+    WS_ROOM_CONTROL_BURST: int = 10
+    
+    # A room whose owner drops is frozen this long before it closes (0 closes it at once)
+    WS_OWNER_GRACE_PERIOD: float = 30.0
+    
+    # Chat history is written behind in batches
+    CHAT_FLUSH_BATCH_SIZE: int = 200
+    CHAT_FLUSH_INTERVAL: float = 1.0
+    CHAT_MAX_PENDING: int = 10000
+    
+    # Trust the signed token's claims for request.state.user and skip the user lookup;
+    # routes that need the full row depend on auth.dependencies.current_user
+    AUTH_CLAIMS_ONLY: bool = False
+    
+    # Otherwise authenticated users are cached per worker, and in Redis too when shared
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL: float = 60.0
+    AUTH_USER_CACHE_SHARED: bool = False
+    
+    # Password hashing runs on AUTH_HASH_WORKERS threads; hashes with another cost
+    # are redone at login, and past AUTH_HASH_MAX_PENDING queued hashes logins get a 503
+    AUTH_BCRYPT_ROUNDS: int = 12
+    AUTH_HASH_WORKERS: int = 2
+    AUTH_HASH_MAX_PENDING: int = 64
+    
+    # Revoked refresh tokens are remembered per worker, and in Redis too when shared
+    AUTH_DENYLIST_SHARED: bool = False
+    
+    # Bearer token Prometheus sends to scrape /metrics and /db/pool; empty turns both off
+    METRICS_TOKEN: str = ""
+    
+    # Redis for realtime state (Celery uses db 0 and 1)
+    REDIS_HOST: str = "redis"
+    REDIS_PORT: int = 6379
+    REDIS_REALTIME_DB: int = 2
+    
+    # Share rooms across workers/nodes over Redis pub/sub
+    WS_BACKPLANE_ENABLED: bool = False
+    WS_BACKPLANE_KEY_TTL: int = 86400
+    
+    # Write live playback state through to Redis for failover (always on with the backplane)
+    WS_STATE_STORE_ENABLED: bool = False
+    WS_STATE_TTL: int = 3600
+    WS_STATE_PROGRESS_INTERVAL: float = 2.0
+    
     model_config = SettingsConfigDict(env_file='.env', extra='ignore')
 
 
 
-Config = Settings()
\ No newline at end of file
+Config = Settings()
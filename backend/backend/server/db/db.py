@@ -1,10 +1,93 @@
+import time
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 from sqlmodel import Session, SQLModel, create_engine
 from backend.server.config.config import Config as settings
+from backend.server.metrics.metrics import registry
 
 if settings.DATABASE_URL is None:
     raise ValueError("DATABASE_URL is not set")
 
-engine = create_engine(settings.DATABASE_URL, echo=True)
+POOL_WAIT_SECONDS = registry.histogram(
+    "db_pool_checkout_seconds",
+    "Time taken to get a connection from the pool, including opening overflow connections",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            POOL_WAIT_SECONDS.observe(waited)
+
+    def recreate(self):
+        # Keep the stats when dispose() swaps in a fresh pool
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.wait_seconds = self.wait_seconds
+        pool.max_wait_seconds = self.max_wait_seconds
+        return pool
+
+
+def _connect_args(url: str) -> dict:
+    if settings.DB_STATEMENT_TIMEOUT_MS and make_url(url).get_backend_name() == "postgresql":
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=settings.DB_ECHO,
+    poolclass=TimedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args=_connect_args(settings.DATABASE_URL),
+)
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # Negative while the pool hasn't opened all of its pool_size connections yet
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checkouts": pool.checkouts,
+        "wait_seconds_total": pool.wait_seconds,
+        "wait_seconds_max": pool.max_wait_seconds,
+    }
+
+
+registry.gauge(
+    "db_pool_connections",
+    "Pooled database connections by state",
+    lambda: {
+        ("checked_out",): engine.pool.checkedout(),
+        ("checked_in",): engine.pool.checkedin(),
+        ("overflow",): max(0, engine.pool.overflow()),
+    },
+    labels=("state",),
+)
 
 class Database:
     def __init__(self):
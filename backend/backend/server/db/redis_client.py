@@ -0,0 +1,25 @@
+import redis.asyncio as aioredis
+from backend.server.config.config import Config as settings
+
+# Every key and channel the app uses in Redis starts with this
+KEY_PREFIX = "syncstream"
+
+_client = None
+
+def get_redis() -> aioredis.Redis:
+    """Shared async Redis client for realtime state, created on first use"""
+    global _client
+    if _client is None:
+        _client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_REALTIME_DB,
+            decode_responses=True
+        )
+    return _client
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
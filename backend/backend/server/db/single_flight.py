@@ -0,0 +1,44 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Runs one load per key at a time; callers arriving while it runs share its result.
+
+    Caches use it so a burst of misses for the same key costs one database query.
+    """
+
+    def __init__(self):
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        pending = self._loading.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            # The caller running the load went away (e.g. its client disconnected),
+            # which says nothing about this one; the first waiter back takes over
+            return await self.do(key, load)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            result = await load()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Waiters shouldn't hang on a load that will never finish, they retry it
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved so a load nobody else waited on doesn't warn
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
@@ -2,43 +2,103 @@ from fastapi import FastAPI,HTTPException, WebSocket, WebSocketDisconnect, Query
 
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from sqlmodel import Session,select, and_
+from sqlmodel import select, and_
 
 from backend.server.db.db import db
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from backend.server.auth.util import decode_token
-from backend.server.model.model import User,VideoTask
+from backend.server.model.model import VideoTask
 from pydantic import BaseModel
 from backend.server.user.routes import user_router
 from backend.server.auth.router import auth_router
 from backend.server.videotask.routes import video_router
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from backend.server.db.db import get_session
+from backend.server.db.db import get_session, pool_stats
+from backend.server.db.redis_client import close_redis
 from backend.server.room.room_routes import router as room_router
-from typing import Callable
+from typing import Callable, Optional
 from backend.server.public.public_routes import public_router
 import json
 from backend.server.yt import handle_request
 import logging
 from backend.worker.tasks import process_video
-from .room.ws import handle_websocket
+from .room.ws import handle_websocket, manager
+from .room.chat_writer import chat_writer
+from .auth.user_cache import AuthUser, user_cache
+from .auth.hashing import password_hasher
+from .metrics.metrics import registry, CONTENT_TYPE
+from fastapi.responses import Response
+from backend.server.config.config import Config
+import asyncio
+import hmac
+import signal
+import threading
 
 
 class MyFastAPI(FastAPI):
     pass
 
+
+def drain_on_signal():
+    """Drain websockets as soon as a shutdown signal arrives, then hand the signal to uvicorn.
+
+    Uvicorn closes every websocket before the lifespan's shutdown half runs, which
+    would send all viewers back at once; draining first spreads them out.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        # Signals only reach the main thread (e.g. not under TestClient or an embedded
+        # uvicorn), the lifespan drain still runs on shutdown
+        return
+    loop = asyncio.get_running_loop()
+    draining = set()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        async def drain_then_exit(sig=sig, previous=previous):
+            try:
+                await manager.drain(Config.WS_DRAIN_WINDOW)
+            finally:
+                previous(sig, None)
+
+        def handler(sig=sig, previous=previous, drain_then_exit=drain_then_exit):
+            if manager.draining:
+                # A second signal skips the rest of the drain
+                previous(sig, None)
+                return
+            task = asyncio.create_task(drain_then_exit())
+            draining.add(task)
+            task.add_done_callback(draining.discard)
+
+        try:
+            loop.add_signal_handler(sig, handler)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # No loop signal handlers on Windows, the lifespan drain still runs
+            return
+
 @asynccontextmanager
 async def lifespan(app:  MyFastAPI):
     try:
          db.init_db()
+         await manager.start()
+         await chat_writer.start()
+         await user_cache.start()
+         drain_on_signal()
          print("Visit: http://127.0.0.1:3080 for API")
          print("Visit: http://127.0.0.1:3080/docs for API documentation.")
          print()  
          yield 
     finally:
              print("\n🛑 Shutting down FastChain server...")
+             await manager.drain(Config.WS_DRAIN_WINDOW)
+             await manager.stop()
+             await chat_writer.stop()
+             await user_cache.stop()
+             password_hasher.shutdown()
+             await close_redis()
 
 
 
@@ -73,24 +133,35 @@ logger = logging.getLogger(__name__)
 
 logger = logging.getLogger(__name__)
 
+# Routes that skip authentication, checked with one set lookup and one prefix test
+PUBLIC_PATHS = frozenset([
+    "/auth/login",
+    "/auth/signup",
+    "/auth/refresh",
+    "/auth/logout",
+    "/docs",
+    "/openapi.json",
+    "/favicon.ico",
+    "/s3",
+    "/metrics",
+    "/db/pool",
+    "/ws",
+    "/public/room",
+    "/public/yt",
+    "/api-docs",
+])
+PUBLIC_PREFIXES = ("/public/room/",)
+
+
+def is_public_path(path: str) -> bool:
+    return path in PUBLIC_PATHS or path.startswith(PUBLIC_PREFIXES)
+
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next: Callable):
     if request.method == "OPTIONS":
         return await call_next(request)
 
-    if request.url.path in [
-        "/auth/login", 
-        "/auth/signup",
-        "/docs", 
-        "/openapi.json", 
-        "/favicon.ico",
-        "/s3",
-        "/ws",
-        "/public/room",
-        "/public/yt",
-        "/api-docs",
-        "/public/yt"
-    ] or request.url.path.startswith("/public/room/"):  
+    if is_public_path(request.url.path):
         return await call_next(request)
 
     try:
@@ -108,36 +179,33 @@ async def auth_middleware(request: Request, call_next: Callable):
             token_data = decode_token(token)
             if not token_data:
                 raise HTTPException(status_code=401, detail="Invalid token")
-            print("Token data: ", token_data)
+            if token_data.get("refresh"):
+                # Refresh tokens only buy new access tokens at /auth/refresh
+                raise HTTPException(status_code=401, detail="Refresh token used as access token")
             user_id = token_data.get("user")
-            if not user_id:
+            if not user_id or not user_id.get("user_id"):
                 raise HTTPException(status_code=401, detail="User ID missing from token")
                 
         except Exception as e:
             logger.error(f"Token validation error: {str(e)}")
             raise HTTPException(status_code=401, detail="Token validation failed")
             
-        try:
-            print("Getting user from database...")
+        if Config.AUTH_CLAIMS_ONLY:
+            # The signature already vouches for these; the User row loads only on demand
+            request.state.user = AuthUser.from_claims(user_id)
+            return await call_next(request)
             
-            with Session(db.engine) as session:
-                
-                id = user_id["user_id"]
-                
-                print("User ID: ", id)
-                
-                user = session.exec(select(User).where(User.id == id)).first()
-                
-                if not user:
-                    raise HTTPException(status_code=401, detail="User not found")
-                
-                request.state.user = user
-                print("User found: ", user)
-                
+        try:
+            user = await user_cache.get(user_id["user_id"])
         except Exception as e:
             logger.error(f"Database error: {str(e)}")
             raise HTTPException(status_code=500, detail="Database error")
             
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+            
+        request.state.user = user
+            
         response = await call_next(request)
         return response
         
@@ -238,14 +306,33 @@ app.include_router(video_router,prefix="/video",tags=["video"])
 app.include_router(room_router,prefix="/room",tags=["room"])
 app.include_router(public_router,prefix="/public",tags=["public"])
 
+def require_scrape_token(request: Request):
+    """Operational endpoints take a static scrape token, not a user's short-lived JWT"""
+    token = Config.METRICS_TOKEN
+    auth_header = request.headers.get("Authorization") or ""
+    if not token or not hmac.compare_digest(auth_header, f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Unauthorized: Invalid scrape token")
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_scrape_token)])
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/db/pool", include_in_schema=False, dependencies=[Depends(require_scrape_token)])
+async def database_pool():
+    """Connection pool usage, for sizing the pool against the database's connection limit"""
+    return pool_stats()
+
 @app.websocket("/ws/{room_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
     room_id: str, 
     user_id: str = Query(...),  # ... means required parameter
-    name: str = Query(...)
+    name: str = Query(...),
+    epoch: Optional[str] = Query(None),  # sent on reconnect to resume from last_seq
+    last_seq: Optional[int] = Query(None)
 ):
-    await handle_websocket(websocket, room_id, user_id, name)
+    await handle_websocket(websocket, room_id, user_id, name, epoch, last_seq)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,231 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Counters are updated from the event loop, so plain attribute increments are enough.
+# Values updated from worker threads may very rarely lose an increment, which is fine
+# for metrics and cheaper than a lock on every message.
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter:
+    """Monotonic count; Prometheus derives per-second rates from it"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._children: Dict[LabelValues, _CounterChild] = {}
+        if not labels:
+            self._unlabelled = self.labels()
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled.value += amount
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        for values, child in list(self._children.items()):
+            yield self.name + "_total", values, child.value
+
+
+class Gauge:
+    """Value read at scrape time, so keeping it current costs nothing"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Dict[LabelValues, float]],
+        labels: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.collect = collect
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        for values, value in self.collect().items():
+            yield self.name, values, value
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Distribution of observations in fixed cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Tuple[float, ...],
+        labels: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[LabelValues, _HistogramChild] = {}
+        if not labels:
+            self._unlabelled = self._child(())
+
+    def _child(self, values: LabelValues) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            # One extra slot for observations above the last bucket (+Inf)
+            child = self._children[values] = _HistogramChild(len(self.buckets) + 1)
+        return child
+
+    def observe(self, value: float, *label_values: str):
+        child = self._child(label_values) if label_values else self._unlabelled
+        child.counts[bisect_left(self.buckets, value)] += 1
+        child.sum += value
+        child.count += 1
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket", values + (le,), cumulative
+            yield self.name + "_sum", values, child.sum
+            yield self.name + "_count", values, child.count
+
+
+class GaugeHistogram:
+    """Distribution of values read at scrape time, such as the sizes of live rooms.
+
+    Rendered as a histogram, but buckets can go down between scrapes.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], collect: Callable[[], Iterable[float]]):
+        self.name = name
+        self.help = help
+        self.label_names = ()
+        self.buckets = tuple(sorted(buckets))
+        self.collect = collect
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for value in self.collect():
+            counts[bisect_left(self.buckets, value)] += 1
+            total += value
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield self.name + "_bucket", ("+Inf" if bound == float("inf") else repr(bound),), cumulative
+        yield self.name + "_sum", (), total
+        yield self.name + "_count", (), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Dict[LabelValues, float]],
+        labels: Tuple[str, ...] = (),
+    ) -> Gauge:
+        return self.register(Gauge(name, help, collect, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: Tuple[float, ...],
+        labels: Tuple[str, ...] = (),
+    ) -> Histogram:
+        return self.register(Histogram(name, help, buckets, labels))
+
+    def gauge_histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: Tuple[float, ...],
+        collect: Callable[[], Iterable[float]],
+    ) -> GaugeHistogram:
+        return self.register(GaugeHistogram(name, help, buckets, collect))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, values, value in _safe_samples(metric):
+                names = metric.label_names
+                if sample_name.endswith("_bucket"):
+                    names = names + ("le",)
+                lines.append(f"{sample_name}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _safe_samples(metric) -> List[Tuple[str, LabelValues, float]]:
+    # A failing gauge callback shouldn't take the whole scrape down
+    try:
+        return list(metric.samples())
+    except Exception as e:
+        print(f"Error collecting metric {metric.name}: {str(e)}")
+        return []
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
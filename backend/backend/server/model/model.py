@@ -5,7 +5,7 @@ from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from typing import Optional, Dict, Any
 from pydantic import BaseModel
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Index
 
 class ProcessingStatus(str, Enum):
     created="created"
@@ -32,6 +32,9 @@ class UserLogin(SQLModel):
     email: str
     password: str
 
+class TokenRefresh(SQLModel):
+    refresh_token: str
+
 class User(UserBase, table=True):
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     hashed_password: str
@@ -125,4 +128,26 @@ class RemoveVideoFromRoom(SQLModel):
 class RemoveVideoFromRoomResponse(SQLModel):
     message: str
     video_key: str
-    room_id: str
\ No newline at end of file
+    room_id: str
+
+class ChatMessage(SQLModel, table=True):
+    # Keyset pagination walks (room_id, id) backwards
+    __table_args__ = (Index("ix_chatmessage_room_id_id", "room_id", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    room_id: str = Field(foreign_key="room.id", ondelete="CASCADE")
+    user_id: str
+    user_name: str
+    message: str
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class ChatMessageResponse(SQLModel):
+    id: int
+    user_id: str
+    user_name: str
+    message: str
+    created_at: datetime
+
+class ChatHistoryResponse(SQLModel):
+    messages: List[ChatMessageResponse]
+    next_before: Optional[int]
\ No newline at end of file
@@ -0,0 +1,53 @@
+import asyncio
+import random
+import time
+from typing import Optional
+from fastapi import WebSocket
+from fastapi.responses import JSONResponse
+
+# Close code for a join refused because the server is busy ("Try Again Later")
+TRY_AGAIN_LATER_CLOSE_CODE = 1013
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs a timer, a direct sign it is saturated"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        # Seconds; jumps up with each late tick, halves on every tick after
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - start - self.interval)
+            self.lag = max(lag, self.lag / 2)
+
+
+def retry_after(base: int) -> int:
+    """Seconds a refused client should wait, jittered so refused clients don't all come back at once"""
+    return base + random.randint(0, base)
+
+
+async def deny(websocket: WebSocket, reason: str, retry_after: int):
+    """Refuse a websocket before accepting it"""
+    if "websocket.http.response" in websocket.scope.get("extensions", {}):
+        # The server can send a real HTTP response in place of the handshake
+        await websocket.send_denial_response(JSONResponse(
+            {"detail": reason, "retry_after": retry_after},
+            status_code=503,
+            headers={"Retry-After": str(retry_after)},
+        ))
+    else:
+        # Otherwise the handshake just fails; the reason only reaches the logs
+        await websocket.close(code=TRY_AGAIN_LATER_CLOSE_CODE, reason=f"{reason}; retry after {retry_after}s")
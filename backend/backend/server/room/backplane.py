@@ -0,0 +1,139 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, Set
+from uuid import uuid4
+import redis.asyncio as aioredis
+
+from backend.server.db.redis_client import KEY_PREFIX
+
+# Envelope kinds
+FRAME = "f"
+DROPPABLE_FRAME = "d"
+CLOSE = "c"
+
+
+def room_channel(room_id: str) -> str:
+    return f"{KEY_PREFIX}:room:{room_id}"
+
+
+def owner_key(room_id: str) -> str:
+    return f"{KEY_PREFIX}:room:{room_id}:owner"
+
+
+def members_key(room_id: str) -> str:
+    return f"{KEY_PREFIX}:room:{room_id}:members"
+
+
+class RedisBackplane:
+    """Relays room events between nodes over one Redis pub/sub channel per room.
+
+    Each node only subscribes to rooms it has local sockets in, and fans
+    incoming frames out to those sockets. Room ownership and membership live
+    in Redis so every node sees the same picture.
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        on_frame: Callable[[str, str, Optional[str], bool], None],
+        on_close: Callable[[str], Awaitable[None]],
+        key_ttl: int,
+    ):
+        self.redis = redis
+        self.on_frame = on_frame
+        self.on_close = on_close
+        self.key_ttl = key_ttl
+        self.node_id = uuid4().hex
+        self.pubsub = redis.pubsub()
+        self.rooms: Set[str] = set()
+        self._has_rooms = asyncio.Event()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._listener = asyncio.create_task(self._listen())
+        print(f"Backplane started on node {self.node_id}")
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await self.pubsub.aclose()
+
+    async def join_room(self, room_id: str):
+        """Start receiving a room's events on this node"""
+        if room_id not in self.rooms:
+            self.rooms.add(room_id)
+            await self.pubsub.subscribe(room_channel(room_id))
+            self._has_rooms.set()
+
+    async def leave_room(self, room_id: str):
+        """Stop receiving a room's events once this node has no sockets in it"""
+        if room_id in self.rooms:
+            self.rooms.discard(room_id)
+            await self.pubsub.unsubscribe(room_channel(room_id))
+            if not self.rooms:
+                self._has_rooms.clear()
+
+    async def publish(
+        self,
+        room_id: str,
+        frame: str,
+        exclude_user: Optional[str] = None,
+        droppable: bool = False,
+    ):
+        # The frame is already encoded, so it goes out as-is behind a small header
+        kind = DROPPABLE_FRAME if droppable else FRAME
+        await self.redis.publish(
+            room_channel(room_id),
+            f"{kind}\n{self.node_id}\n{exclude_user or ''}\n{frame}"
+        )
+
+    async def publish_close(self, room_id: str):
+        await self.redis.publish(room_channel(room_id), f"{CLOSE}\n{self.node_id}\n\n")
+
+    async def _listen(self):
+        while True:
+            try:
+                # Reading a pubsub with no subscriptions raises, so wait for the first room
+                await self._has_rooms.wait()
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message is None:
+                    continue
+                kind, node_id, exclude_user, payload = message["data"].split("\n", 3)
+                # Local sockets already got our own events directly
+                if node_id == self.node_id:
+                    continue
+                room_id = message["channel"].rsplit(":", 1)[1]
+                if kind == FRAME or kind == DROPPABLE_FRAME:
+                    self.on_frame(room_id, payload, exclude_user or None, kind == DROPPABLE_FRAME)
+                elif kind == CLOSE:
+                    await self.on_close(room_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Backplane listener error: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def set_owner(self, room_id: str, user_id: str):
+        await self.redis.set(owner_key(room_id), user_id, ex=self.key_ttl)
+
+    async def get_owner(self, room_id: str) -> Optional[str]:
+        return await self.redis.get(owner_key(room_id))
+
+    async def add_member(self, room_id: str, user_id: str):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(members_key(room_id), user_id)
+            pipe.expire(members_key(room_id), self.key_ttl)
+            await pipe.execute()
+
+    async def remove_member(self, room_id: str, user_id: str):
+        await self.redis.srem(members_key(room_id), user_id)
+
+    async def is_member(self, room_id: str, user_id: str) -> bool:
+        return bool(await self.redis.sismember(members_key(room_id), user_id))
+
+    async def member_count(self, room_id: str) -> int:
+        return await self.redis.scard(members_key(room_id))
+
+    async def clear_room(self, room_id: str):
+        await self.redis.delete(owner_key(room_id), members_key(room_id))
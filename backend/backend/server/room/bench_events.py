@@ -0,0 +1,39 @@
+import timeit
+
+from backend.server.room.codec import decode, orjson
+from backend.server.room.events import parse_event
+
+ROUNDS = 200000
+
+FRAMES = {
+    "progress": '{"type":"video_event","event_type":"progress","video_time":1234.5}',
+    "play": '{"type":"video_event","event_type":"play","video_time":12.0,"rate":1.0}',
+    "chat": '{"type":"chat","message":"hello everyone, this is a chat message"}',
+    "pong": '{"type":"pong"}',
+}
+
+
+def adhoc(frame: str):
+    # The old receive loop: decode, then only check there is a type
+    data = decode(frame)
+    if not isinstance(data, dict) or "type" not in data:
+        raise ValueError("Invalid message format")
+    return data
+
+
+def per_frame_us(parse, frame: str) -> float:
+    return timeit.timeit(lambda: parse(frame), number=ROUNDS) / ROUNDS * 1e6
+
+
+def main():
+    modes = (("ad-hoc", adhoc), ("validated", parse_event))
+    print(f"Decoding with {'orjson' if orjson is not None else 'the stdlib json module'}")
+    print(f"{'frame':>10}" + "".join(f"{name + ' us':>16}" for name, _ in modes))
+    for name, frame in FRAMES.items():
+        timings = [per_frame_us(parse, frame) for _, parse in modes]
+        print(f"{name:>10}" + "".join(f"{timing:>16.2f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    print("Timing inbound event parsing...")
+    main()
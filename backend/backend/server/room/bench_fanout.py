@@ -0,0 +1,109 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from backend.server.room.fanout import fan_out
+from backend.server.room.codec import encode
+from backend.server.room.connection import Connection
+
+# Simulated per-socket write latency: most viewers are fast, a few are on bad links
+FAST_SEND = 0.001
+SLOW_SEND = 0.05
+SLOW_RATIO = 0.02
+ROUNDS = 20
+SEQUENTIAL_ROUNDS = 3
+SEND_TIMEOUT = 1.0
+QUEUE_HIGH_WATER = 256
+
+
+class FakeWebSocket:
+    def __init__(self, latency: float, delivered: "Delivery"):
+        self.latency = latency
+        self.delivered = delivered
+
+    async def send_json(self, message: dict):
+        # Starlette encodes the dict for every recipient
+        json.dumps(message)
+        await asyncio.sleep(self.latency)
+
+    async def send_text(self, frame: str):
+        await asyncio.sleep(self.latency)
+        self.delivered.mark()
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+class Delivery:
+    """Counts frames that reached a socket, fires once every viewer has the current one"""
+
+    def __init__(self):
+        self.remaining = 0
+        self.done = asyncio.Event()
+
+    def expect(self, count: int):
+        self.remaining = count
+        self.done.clear()
+
+    def mark(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.done.set()
+
+
+def make_room(viewers: int) -> dict:
+    delivered = Delivery()
+    room = {}
+    for i in range(viewers):
+        websocket = FakeWebSocket(
+            SLOW_SEND if random.random() < SLOW_RATIO else FAST_SEND, delivered
+        )
+        room[f"user{i}"] = Connection(
+            websocket, f"user{i}", max_queue=QUEUE_HIGH_WATER, send_timeout=SEND_TIMEOUT
+        )
+    return room
+
+
+async def sequential(room: dict, message: dict):
+    # The old broadcast_to_room loop
+    for connection in room.values():
+        await connection.websocket.send_json(message)
+
+
+async def concurrent(room: dict, message: dict):
+    # Fan-out only queues; latency is until the last viewer's writer has sent the frame
+    delivered = next(iter(room.values())).websocket.delivered
+    delivered.expect(len(room))
+    fan_out(room, encode(message))
+    await delivered.done.wait()
+
+
+async def measure(send, room: dict, rounds: int) -> list:
+    message = {"type": "chat", "user_id": "owner", "message": "hello"}
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await send(room, message)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def main():
+    print(f"{'viewers':>8} {'mode':>11} {'p50 ms':>10} {'max ms':>10}")
+    for viewers in (10, 100, 1000):
+        room = make_room(viewers)
+        # Sequential sends on a 1000 viewer room take seconds, keep it to a few rounds
+        for name, send, rounds in (
+            ("sequential", sequential, SEQUENTIAL_ROUNDS),
+            ("concurrent", concurrent, ROUNDS),
+        ):
+            timings = await measure(send, room, rounds)
+            print(f"{viewers:>8} {name:>11} {statistics.median(timings):>10.2f} {max(timings):>10.2f}")
+        await asyncio.gather(*(connection.close() for connection in room.values()))
+
+
+if __name__ == "__main__":
+    print("Starting fan-out benchmark...")
+    asyncio.run(main())
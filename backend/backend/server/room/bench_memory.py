@@ -0,0 +1,91 @@
+import asyncio
+import gc
+import tracemalloc
+
+from backend.server.room.connection import Connection
+from backend.server.room.event_log import RoomEventLog
+from backend.server.room.rate_limit import TokenBucket
+from backend.server.room.records import RoomRecord
+
+CONNECTIONS = 10000
+ROOM_SIZE = 100
+TARGET_SOCKETS = 100000
+SEND_TIMEOUT = 1.0
+QUEUE_HIGH_WATER = 256
+
+
+class FakeWebSocket:
+    """Never finishes a send, so writers stay alive while we measure"""
+
+    async def send_text(self, frame: str):
+        await asyncio.Event().wait()
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def make_rooms(websocket: FakeWebSocket) -> dict:
+    rooms = {}
+    for i in range(CONNECTIONS):
+        room_id = f"room{i // ROOM_SIZE}"
+        record = rooms.get(room_id)
+        if record is None:
+            record = rooms[room_id] = RoomRecord(
+                room_id,
+                RoomEventLog(max_events=100, max_bytes=262144),
+                chat_bucket=TokenBucket(20.0, 50),
+                control_bucket=TokenBucket(5.0, 10),
+            )
+        user_id = f"user{i}"
+        record.connections[user_id] = Connection(
+            websocket,
+            user_id,
+            max_queue=QUEUE_HIGH_WATER,
+            send_timeout=SEND_TIMEOUT,
+            name=f"Viewer {i}",
+        )
+    return rooms
+
+
+def measured(build) -> tuple:
+    gc.collect()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size / CONNECTIONS
+
+
+async def main():
+    # The socket itself belongs to the ASGI server and is not counted here
+    websocket = FakeWebSocket()
+    tracemalloc.start()
+
+    rooms, idle = measured(lambda: make_rooms(websocket))
+
+    def queue_frames():
+        for record in rooms.values():
+            for connection in record.connections.values():
+                connection.send('{"type":"ping"}')
+
+    # Queuing a frame starts the connection's writer task
+    _, busy = measured(queue_frames)
+    tracemalloc.stop()
+
+    print(f"{'state':>22} {'bytes/conn':>12} {f'MB @ {TARGET_SOCKETS}':>14}")
+    for name, per_connection in (
+        ("idle", idle),
+        ("sending", idle + busy),
+    ):
+        print(f"{name:>22} {per_connection:>12.0f} {per_connection * TARGET_SOCKETS / 2**20:>14.1f}")
+
+    for record in rooms.values():
+        for connection in record.connections.values():
+            connection.abort(1000, "")
+    await asyncio.sleep(0)
+
+
+if __name__ == "__main__":
+    print("Measuring per-connection memory...")
+    asyncio.run(main())
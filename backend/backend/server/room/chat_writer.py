@@ -0,0 +1,137 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError, InterfaceError, OperationalError
+from sqlmodel import Session
+
+from backend.server.db.db import engine
+from backend.server.model.model import ChatMessage
+from backend.server.config.config import Config
+
+# Longest wait between retries while the database is unreachable
+MAX_RETRY_DELAY = 30.0
+
+
+def _insert_batch(rows: List[dict]):
+    # One multi-row INSERT for the whole batch
+    with Session(bind=engine) as session:
+        session.execute(insert(ChatMessage), rows)
+        session.commit()
+
+
+def _insert_each(rows: List[dict]) -> int:
+    """Insert rows one at a time, skipping the ones the database rejects.
+
+    Written rows are removed from the list, so after a connection error it holds
+    only what is left to retry. Returns how many rows were skipped.
+    """
+    skipped = 0
+    with Session(bind=engine) as session:
+        while rows:
+            try:
+                session.execute(insert(ChatMessage), rows[:1])
+                session.commit()
+            except (IntegrityError, DataError) as e:
+                session.rollback()
+                print(f"Dropping chat message for room {rows[0]['room_id']}: {str(e)}")
+                skipped += 1
+            rows.pop(0)
+    return skipped
+
+
+class ChatWriter:
+    """Write-behind queue that stores chat messages in batches, off the websocket hot path"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: Deque[dict] = deque()
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, room_id: str, user_id: str, user_name: str, message: str):
+        if len(self.pending) >= self.max_pending:
+            # The database is too far behind; shed the oldest rather than grow without bound
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append({
+            "room_id": room_id,
+            "user_id": user_id,
+            "user_name": user_name,
+            "message": message,
+            "created_at": datetime.now(),
+        })
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self.pending:
+            if not await self.flush():
+                break
+
+    async def _run(self):
+        retry_delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self.pending:
+                if not await self.flush():
+                    # The queue stays full while the database is down, so every new message
+                    # would wake this straight back up; back off before trying again instead
+                    await asyncio.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                    break
+                retry_delay = self.flush_interval
+
+    async def flush(self) -> bool:
+        """Write one batch, return False if the database was unreachable and it must be retried"""
+        batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+        if not batch:
+            return True
+        try:
+            await asyncio.to_thread(_insert_batch, batch)
+            return True
+        except (IntegrityError, DataError):
+            # Some row can never be written (e.g. its room was deleted), and retrying
+            # the whole batch would hold up chat for every room behind it
+            try:
+                self.dropped += await asyncio.to_thread(_insert_each, batch)
+                return True
+            except (OperationalError, InterfaceError) as e:
+                return self._retry(batch, e)
+        except (OperationalError, InterfaceError) as e:
+            return self._retry(batch, e)
+        except Exception as e:
+            print(f"Dropping {len(batch)} chat messages: {str(e)}")
+            self.dropped += len(batch)
+            return True
+
+    def _retry(self, batch: List[dict], error: Exception) -> bool:
+        """Put a batch back in front after a connection error, to retry once the writer backs off"""
+        print(f"Error writing {len(batch)} chat messages: {str(error)}")
+        self.pending.extendleft(reversed(batch))
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+        return False
+
+
+chat_writer = ChatWriter(
+    batch_size=Config.CHAT_FLUSH_BATCH_SIZE,
+    flush_interval=Config.CHAT_FLUSH_INTERVAL,
+    max_pending=Config.CHAT_MAX_PENDING,
+)
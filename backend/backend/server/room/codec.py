@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, without it every client speaks JSON
+    msgpack = None
+
+# Websocket subprotocols a client can offer; JSON is what clients get without one
+MSGPACK_SUBPROTOCOL = "syncstream.msgpack"
+JSON_SUBPROTOCOL = "syncstream.json"
+
+# Short field ids for the keys repeated in nearly every MessagePack frame
+SHORT_KEYS = {
+    "type": "t",
+    "seq": "q",
+    "user_id": "u",
+    "user_name": "n",
+    "timestamp": "ts",
+    "event_type": "e",
+    "video_time": "v",
+    "rate": "r",
+    "server_time": "st",
+    "client_time": "ct",
+    "message": "m",
+}
+LONG_KEYS = {short: key for key, short in SHORT_KEYS.items()}
+
+
+def encode(message: Any) -> str:
+    """Serialize a message into a websocket text frame"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message).decode()
+        except TypeError:
+            # orjson rejects a few things the stdlib accepts (e.g. ints over 64 bits)
+            pass
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode(frame: Union[str, bytes]) -> Any:
+    """Parse a websocket frame, raises ValueError on invalid JSON"""
+    if orjson is not None:
+        return orjson.loads(frame)
+    return json.loads(frame)
+
+
+def choose_subprotocol(offered: Sequence[str]) -> Optional[str]:
+    """Pick the subprotocol to accept from the ones a client offered"""
+    if msgpack is not None and MSGPACK_SUBPROTOCOL in offered:
+        return MSGPACK_SUBPROTOCOL
+    if JSON_SUBPROTOCOL in offered:
+        return JSON_SUBPROTOCOL
+    return None
+
+
+def encode_binary(message: dict) -> bytes:
+    """Serialize a message into a MessagePack frame with short keys and epoch-ms timestamps"""
+    packed = {}
+    for key, value in message.items():
+        if key == "timestamp" and isinstance(value, str):
+            value = int(datetime.fromisoformat(value).timestamp() * 1000)
+        packed[SHORT_KEYS.get(key, key)] = value
+    return msgpack.packb(packed)
+
+
+def decode_binary(frame: bytes) -> dict:
+    """Parse a MessagePack frame back to long keys, raises ValueError if it isn't a map"""
+    try:
+        data = msgpack.unpackb(frame)
+    except Exception as e:
+        raise ValueError(str(e))
+    if not isinstance(data, dict):
+        raise ValueError("Frame is not a map")
+    return {LONG_KEYS.get(key, key): value for key, value in data.items()}
+
+
+def transcode(frame: str) -> bytes:
+    """Convert an encoded JSON frame for a MessagePack client"""
+    return encode_binary(decode(frame))
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple, Union
+from fastapi import WebSocket
+from backend.server.room.codec import encode, encode_binary, transcode
+from backend.server.room.rate_limit import TokenBucket
+from backend.server.room.ws_metrics import FRAMES_SHED, SEND_FAILURES, SEND_SECONDS
+
+# Close code sent to a viewer whose outbound queue overflowed
+SLOW_CONSUMER_CLOSE_CODE = 4008
+# Close code sent to a client that stopped answering heartbeats
+HEARTBEAT_TIMEOUT_CLOSE_CODE = 4002
+# Close code sent to a socket whose user reconnected on another one
+REPLACED_CLOSE_CODE = 4001
+
+# Queue marker telling the writer to close the socket once everything before it is sent
+_CLOSE = object()
+
+
+class Connection:
+    """A websocket plus its bounded outbound queue, drained by a writer task while frames are pending.
+
+    Also the user's presence record for the room. Slotted and without an idle
+    writer task, since a node holds one of these per open socket.
+    """
+
+    __slots__ = (
+        "websocket", "user_id", "name", "is_owner", "binary", "joined_at", "last_seen",
+        "frames_in", "frames_out", "frames_dropped", "chat_bucket", "control_bucket",
+        "max_queue", "send_timeout", "on_drop", "queue", "closed", "_close_args", "_writer",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        max_queue: int,
+        send_timeout: float,
+        on_drop: Optional[Callable[["Connection"], None]] = None,
+        name: str = "",
+        is_owner: bool = False,
+        binary: bool = False,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.name = name
+        self.is_owner = is_owner
+        # Speaks the MessagePack subprotocol instead of JSON text
+        self.binary = binary
+        # Wall clock of the join, sent along with presence
+        self.joined_at = time.time()
+        # Monotonic time of the last frame received from this client
+        self.last_seen = time.monotonic()
+        self.frames_in = 0
+        self.frames_out = 0
+        self.frames_dropped = 0
+        # Rate limits, created the first time the user sends that kind of event
+        self.chat_bucket: Optional[TokenBucket] = None
+        self.control_bucket: Optional[TokenBucket] = None
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.on_drop = on_drop
+        self.queue: Deque[Tuple[object, bool]] = deque()
+        self.closed = False
+        self._close_args: Tuple[int, str] = (1000, "")
+        self._writer: Optional[asyncio.Task] = None
+
+    def touch(self):
+        """Record a frame from the client, which also proves it is still alive"""
+        self.last_seen = time.monotonic()
+        self.frames_in += 1
+
+    def presence(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "user_name": self.name,
+            "is_owner": self.is_owner,
+            "joined_at": int(self.joined_at * 1000),
+        }
+
+    def send(self, frame: Union[str, bytes], droppable: bool = False) -> bool:
+        """Queue a frame already encoded for this connection's protocol, return False if the connection is gone"""
+        if self.closed:
+            return False
+        # At the high-water mark shed droppable frames first, then the viewer
+        if len(self.queue) >= self.max_queue and not self._drop_stale():
+            print(f"Outbound queue full for user {self.user_id}, disconnecting slow consumer")
+            SEND_FAILURES.labels("slow_consumer").inc()
+            self.abort(SLOW_CONSUMER_CLOSE_CODE, "Slow consumer")
+            return False
+        self.queue.append((frame, droppable))
+        self._kick()
+        return True
+
+    def send_message(self, message: dict, droppable: bool = False) -> bool:
+        """Encode a message for this connection's protocol and queue it"""
+        return self.send(encode_binary(message) if self.binary else encode(message), droppable)
+
+    def send_json_frame(self, frame: str, droppable: bool = False) -> bool:
+        """Queue an encoded JSON frame, converted if this connection speaks MessagePack"""
+        return self.send(transcode(frame) if self.binary else frame, droppable)
+
+    def _kick(self):
+        # Idle connections hold no task; one is started when there is something to send
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._drain())
+
+    def _drop_stale(self) -> bool:
+        """Discard queued droppable frames, return True if any room was freed"""
+        before = len(self.queue)
+        self.queue = deque(item for item in self.queue if not item[1])
+        self.frames_dropped += before - len(self.queue)
+        FRAMES_SHED.inc(before - len(self.queue))
+        return len(self.queue) < before
+
+    async def _drain(self):
+        try:
+            while self.queue:
+                frame, _ = self.queue.popleft()
+                if frame is _CLOSE:
+                    code, reason = self._close_args
+                    await asyncio.wait_for(
+                        self.websocket.close(code=code, reason=reason), self.send_timeout
+                    )
+                    return
+                start = time.perf_counter()
+                if self.binary:
+                    await asyncio.wait_for(self.websocket.send_bytes(frame), self.send_timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+                SEND_SECONDS.observe(time.perf_counter() - start)
+                self.frames_out += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Send to user {self.user_id} failed: {str(e)}")
+            SEND_FAILURES.labels("timeout" if isinstance(e, asyncio.TimeoutError) else "error").inc()
+            self.abort(1011, "Send failed")
+        finally:
+            self._writer = None
+
+    def abort(self, code: int, reason: str):
+        """Abandon the queue, close the socket and let the manager clean up"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        asyncio.create_task(self._force_close(code, reason))
+        if self.on_drop is not None:
+            self.on_drop(self)
+
+    async def _force_close(self, code: int, reason: str):
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=code, reason=reason), self.send_timeout
+            )
+        except Exception:
+            pass
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        """Send whatever is already queued, then close the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        self._close_args = (code, reason)
+        self.queue.append((_CLOSE, False))
+        self._kick()
+        writer = self._writer
+        try:
+            # Bounded by the per-send timeout for every frame still in the queue
+            await asyncio.wait_for(
+                asyncio.shield(writer), self.send_timeout * (len(self.queue) + 1)
+            )
+        except Exception:
+            writer.cancel()
+            await self._force_close(code, reason)
@@ -0,0 +1,51 @@
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+from uuid import uuid4
+
+
+def stamp(frame: str, seq: int) -> str:
+    """Splice a sequence number into an encoded JSON object without re-encoding it"""
+    return f'{{"seq":{seq},{frame[1:]}'
+
+
+class RoomEventLog:
+    """Bounded ring buffer of a room's sequenced broadcast frames, for replay on reconnect"""
+
+    def __init__(self, max_events: int, max_bytes: int):
+        # Sequence numbers are only comparable within one epoch; a new log
+        # (room reopened, node restarted, different node) starts a new one
+        self.epoch = uuid4().hex[:12]
+        self.seq = 0
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        # (seq, stamped frame, user the broadcast skipped)
+        self.frames: Deque[Tuple[int, str, Optional[str]]] = deque()
+        self.size = 0
+
+    def append(self, frame: str, exclude_user: Optional[str] = None) -> str:
+        """Assign the next sequence number, return the stamped frame to send"""
+        self.seq += 1
+        stamped = stamp(frame, self.seq)
+        self.frames.append((self.seq, stamped, exclude_user))
+        self.size += len(stamped)
+        while self.frames and (len(self.frames) > self.max_events or self.size > self.max_bytes):
+            _, oldest, _ = self.frames.popleft()
+            self.size -= len(oldest)
+        return stamped
+
+    def since(self, epoch: Optional[str], last_seq: Optional[int], user_id: Optional[str] = None) -> Optional[List[str]]:
+        """Frames after last_seq for user_id, or None if they can't be replayed and a snapshot is needed.
+
+        Frames broadcast without that user (their own play/pause/seek) are skipped,
+        or a reconnecting controller would apply them twice.
+        """
+        if epoch != self.epoch or last_seq is None or last_seq > self.seq:
+            return None
+        if last_seq == self.seq:
+            return []
+        if not self.frames or self.frames[0][0] > last_seq + 1:
+            return None
+        return [
+            frame for seq, frame, exclude_user in self.frames
+            if seq > last_seq and (exclude_user is None or exclude_user != user_id)
+        ]
@@ -0,0 +1,173 @@
+from typing import Callable, Dict, Literal, NotRequired, Optional, TypedDict, Union
+
+from backend.server.room.codec import decode
+
+MAX_CHAT_LENGTH = 2000
+
+# Client events are TypedDicts: validation yields plain dicts, with no model instances
+# to build per frame. Keys the server fills in itself (user_id, user_name, seq, ...)
+# are not copied over, so clients can't set them.
+#
+# Each type has a small hand-written validator, picked by "type" in one dict lookup.
+# Inbound frames are the hottest path on the server: checking every field this way
+# costs about 1us per frame over decoding alone, a quarter of what a pydantic
+# TypeAdapter over the same union took (see bench_events.py).
+
+
+class PongEvent(TypedDict):
+    type: Literal["pong"]
+
+
+class VideoEvent(TypedDict):
+    type: Literal["video_event"]
+    event_type: Literal["play", "pause", "forward_10", "back_10", "video_time", "progress"]
+    video_time: float
+    rate: NotRequired[Optional[float]]
+
+
+class ChatEvent(TypedDict):
+    type: Literal["chat"]
+    message: str
+
+
+class ReactionEvent(TypedDict):
+    type: Literal["reaction"]
+    reaction: str
+
+
+class SetCohostEvent(TypedDict):
+    type: Literal["set_cohost"]
+    cohost_id: NotRequired[Optional[str]]
+
+
+class TimeSyncEvent(TypedDict):
+    type: Literal["time_sync"]
+    client_time: NotRequired[Optional[float]]
+
+
+ClientEvent = Union[PongEvent, VideoEvent, ChatEvent, ReactionEvent, SetCohostEvent, TimeSyncEvent]
+
+INF = float("inf")
+VIDEO_EVENT_TYPES = frozenset(["play", "pause", "forward_10", "back_10", "video_time", "progress"])
+
+
+class EventError(ValueError):
+    """A frame that isn't a valid client event; the message is sent back to the client"""
+
+
+def _missing(event_type: str, field: str) -> EventError:
+    return EventError(f"Missing {field} in {event_type}")
+
+
+def _invalid(event_type: str, field: str, reason: str) -> EventError:
+    return EventError(f"Invalid {field} in {event_type}: {reason}")
+
+
+def _number(value: object, event_type: str, field: str) -> float:
+    # bool is an int, but never a valid time
+    if type(value) is not float:
+        if type(value) is not int:
+            raise _invalid(event_type, field, "Input should be a valid number")
+        try:
+            value = float(value)
+        except OverflowError:
+            # The stdlib decoder keeps integers of any size
+            raise _invalid(event_type, field, "Input should be a finite number") from None
+    if not -INF < value < INF:
+        raise _invalid(event_type, field, "Input should be a finite number")
+    return value
+
+
+def _pong(data: dict) -> PongEvent:
+    return {"type": "pong"}
+
+
+def _video_event(data: dict) -> VideoEvent:
+    event_type = data.get("event_type")
+    if event_type is None:
+        raise _missing("video_event", "event_type")
+    if type(event_type) is not str or event_type not in VIDEO_EVENT_TYPES:
+        raise _invalid("video_event", "event_type", "Unknown video event")
+    video_time = data.get("video_time")
+    if video_time is None:
+        raise _missing("video_event", "video_time")
+    video_time = _number(video_time, "video_event", "video_time")
+    if video_time < 0:
+        raise _invalid("video_event", "video_time", "Input should be greater than or equal to 0")
+    event: VideoEvent = {"type": "video_event", "event_type": event_type, "video_time": video_time}
+    if "rate" in data:
+        rate = data["rate"]
+        if rate is not None:
+            rate = _number(rate, "video_event", "rate")
+            if rate <= 0:
+                raise _invalid("video_event", "rate", "Input should be greater than 0")
+        event["rate"] = rate
+    return event
+
+
+def _chat(data: dict) -> ChatEvent:
+    message = data.get("message")
+    if message is None:
+        raise _missing("chat", "message")
+    if type(message) is not str:
+        raise _invalid("chat", "message", "Input should be a valid string")
+    if not message:
+        raise _invalid("chat", "message", "String should have at least 1 character")
+    if len(message) > MAX_CHAT_LENGTH:
+        raise _invalid("chat", "message", f"String should have at most {MAX_CHAT_LENGTH} characters")
+    return {"type": "chat", "message": message}
+
+
+def _reaction(data: dict) -> ReactionEvent:
+    reaction = data.get("reaction")
+    if reaction is None:
+        raise _missing("reaction", "reaction")
+    if type(reaction) is not str:
+        raise _invalid("reaction", "reaction", "Input should be a valid string")
+    return {"type": "reaction", "reaction": reaction}
+
+
+def _set_cohost(data: dict) -> SetCohostEvent:
+    cohost_id = data.get("cohost_id")
+    if cohost_id is not None and type(cohost_id) is not str:
+        raise _invalid("set_cohost", "cohost_id", "Input should be a valid string")
+    return {"type": "set_cohost", "cohost_id": cohost_id}
+
+
+def _time_sync(data: dict) -> TimeSyncEvent:
+    event: TimeSyncEvent = {"type": "time_sync"}
+    if data.get("client_time") is not None:
+        event["client_time"] = _number(data["client_time"], "time_sync", "client_time")
+    return event
+
+
+_VALIDATORS: Dict[str, Callable[[dict], ClientEvent]] = {
+    "pong": _pong,
+    "video_event": _video_event,
+    "chat": _chat,
+    "reaction": _reaction,
+    "set_cohost": _set_cohost,
+    "time_sync": _time_sync,
+}
+
+
+def parse_event(frame: Union[str, bytes]) -> ClientEvent:
+    """Decode and validate a JSON text frame, raises EventError"""
+    try:
+        data = decode(frame)
+    except ValueError:
+        raise EventError("Invalid JSON") from None
+    return validate_event(data)
+
+
+def validate_event(data: object) -> ClientEvent:
+    """Validate an already decoded frame, raises EventError"""
+    if type(data) is not dict:
+        raise EventError("Missing event type")
+    event_type = data.get("type")
+    if event_type is None:
+        raise EventError("Missing event type")
+    validator = _VALIDATORS.get(event_type) if type(event_type) is str else None
+    if validator is None:
+        raise EventError(f"Unknown event type: {event_type}")
+    return validator(data)
@@ -0,0 +1,28 @@
+from typing import Dict, List, Optional
+from backend.server.room.codec import transcode
+from backend.server.room.connection import Connection
+
+
+def fan_out(
+    connections: Dict[str, Connection],
+    frame: str,
+    exclude_user: Optional[str] = None,
+    droppable: bool = False,
+) -> List[str]:
+    """Queue an encoded frame on every connection, return the users that could not take it"""
+    # Each connection's writer task does the actual send, so this never waits on a socket
+    failed = []
+    # Converted once, on the first MessagePack client, and shared by the rest
+    binary_frame = None
+    for user_id, connection in connections.items():
+        if user_id == exclude_user:
+            continue
+        if connection.binary:
+            if binary_frame is None:
+                binary_frame = transcode(frame)
+            sent = connection.send(binary_frame, droppable)
+        else:
+            sent = connection.send(frame, droppable)
+        if not sent:
+            failed.append(user_id)
+    return failed
@@ -0,0 +1,63 @@
+import time
+from typing import Optional
+
+
+def server_time_ms() -> int:
+    """Wall clock in epoch milliseconds, what clients sync their offset against"""
+    return int(time.time() * 1000)
+
+
+class PlaybackClock:
+    """Authoritative playback position for a room.
+
+    The position is stored at a monotonic anchor and extrapolated on demand,
+    so the owner only has to report progress to correct drift.
+    """
+
+    def __init__(self, owner: str, position: float = 0.0, paused: bool = True, rate: float = 1.0):
+        self.owner = owner
+        self.position = position
+        self.paused = paused
+        self.rate = rate
+        self.anchor = time.monotonic()
+        # Wall clock of the last update, used when the clock is persisted and restored
+        self.updated_at = time.time()
+
+    def current_position(self) -> float:
+        if self.paused:
+            return self.position
+        return self.position + (time.monotonic() - self.anchor) * self.rate
+
+    def apply(self, event_type: str, video_time: float, rate: Optional[float] = None):
+        """Re-anchor the clock on an owner video event"""
+        self.position = video_time
+        self.anchor = time.monotonic()
+        self.updated_at = time.time()
+        if event_type == "play":
+            self.paused = False
+        elif event_type == "pause":
+            self.paused = True
+        if rate is not None:
+            self.rate = rate
+
+    def to_state(self) -> dict:
+        return {
+            "position": self.position,
+            "paused": self.paused,
+            "rate": self.rate,
+            "updated_at": self.updated_at,
+            "owner": self.owner,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "PlaybackClock":
+        """Rebuild a clock saved by another process, carrying playback forward to now"""
+        clock = cls(
+            owner=state["owner"],
+            position=state["position"],
+            paused=state["paused"],
+            rate=state.get("rate", 1.0),
+        )
+        if not clock.paused:
+            clock.position += max(0.0, time.time() - state["updated_at"]) * clock.rate
+        return clock
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Set
+from backend.server.room.connection import Connection
+
+
+class _PendingPresence:
+    def __init__(self):
+        self.joined: Dict[str, Connection] = {}
+        self.left: Set[str] = set()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class PresenceBatcher:
+    """Coalesces joins and leaves per room into one roster diff every window.
+
+    Rooms above broadcast_threshold only get the viewer count, since a
+    per-user roster is useless to thousands of viewers and costly to send.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        broadcast_threshold: int,
+        broadcast: Callable[[str, dict], Awaitable[None]],
+        room_size: Callable[[str], Awaitable[int]],
+    ):
+        self.window = window
+        self.broadcast_threshold = broadcast_threshold
+        self.broadcast = broadcast
+        self.room_size = room_size
+        self._pending: Dict[str, _PendingPresence] = {}
+
+    def joined(self, room_id: str, connection: Connection):
+        pending = self._pending_for(room_id)
+        pending.left.discard(connection.user_id)
+        pending.joined[connection.user_id] = connection
+
+    def left(self, room_id: str, user_id: str):
+        pending = self._pending_for(room_id)
+        pending.joined.pop(user_id, None)
+        pending.left.add(user_id)
+
+    def discard(self, room_id: str):
+        """Forget unsent changes for a room that is closing"""
+        pending = self._pending.pop(room_id, None)
+        if pending is not None:
+            # Left armed, it would flush the next join early, outside its own window
+            pending.timer.cancel()
+
+    def _pending_for(self, room_id: str) -> _PendingPresence:
+        pending = self._pending.get(room_id)
+        if pending is None:
+            # First change in this window, the flush goes out when it ends
+            pending = self._pending[room_id] = _PendingPresence()
+            pending.timer = asyncio.get_running_loop().call_later(
+                self.window, lambda: asyncio.create_task(self._flush(room_id))
+            )
+        return pending
+
+    async def _flush(self, room_id: str):
+        pending = self._pending.pop(room_id, None)
+        if pending is None:
+            return
+        try:
+            viewer_count = await self.room_size(room_id)
+            if viewer_count > self.broadcast_threshold:
+                message = {
+                    "type": "viewer_count",
+                    "viewer_count": viewer_count,
+                    "timestamp": datetime.now().isoformat()
+                }
+            else:
+                message = {
+                    "type": "presence",
+                    "joined": [connection.presence() for connection in pending.joined.values()],
+                    "left": list(pending.left),
+                    "viewer_count": viewer_count,
+                    "timestamp": datetime.now().isoformat()
+                }
+            await self.broadcast(room_id, message)
+        except Exception as e:
+            print(f"Error flushing presence for room {room_id}: {str(e)}")
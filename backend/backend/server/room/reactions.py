@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict
+
+# Reactions clients can send, anything else is rejected so counters stay small
+REACTIONS = frozenset(("👍", "❤️", "😂", "😮", "😢", "👏", "🔥", "🎉"))
+
+
+class ReactionAggregator:
+    """Counts reactions per room and sends the totals as one frame every tick.
+
+    Outbound traffic is one frame per room per tick, however many viewers react.
+    """
+
+    def __init__(self, tick: float, broadcast: Callable[..., Awaitable[None]]):
+        self.tick = tick
+        self.broadcast = broadcast
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def add(self, room_id: str, reaction: str) -> bool:
+        if reaction not in REACTIONS:
+            return False
+        counts = self._counts.get(room_id)
+        if counts is None:
+            # First reaction this tick, the totals go out when it ends
+            counts = self._counts[room_id] = {}
+            asyncio.get_running_loop().call_later(
+                self.tick, lambda: asyncio.create_task(self._flush(room_id))
+            )
+        counts[reaction] = counts.get(reaction, 0) + 1
+        return True
+
+    def discard(self, room_id: str):
+        """Forget unsent counts for a room that is closing"""
+        self._counts.pop(room_id, None)
+
+    async def _flush(self, room_id: str):
+        counts = self._counts.pop(room_id, None)
+        if not counts:
+            return
+        try:
+            # Reactions are not worth replaying or keeping in a full queue
+            await self.broadcast(room_id, {
+                "type": "reactions",
+                "counts": counts,
+                "timestamp": datetime.now().isoformat()
+            }, droppable=True)
+        except Exception as e:
+            print(f"Error flushing reactions for room {room_id}: {str(e)}")
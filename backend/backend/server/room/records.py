@@ -0,0 +1,42 @@
+import asyncio
+from typing import Dict, Optional
+
+from backend.server.room.connection import Connection
+from backend.server.room.event_log import RoomEventLog
+from backend.server.room.playback import PlaybackClock
+from backend.server.room.rate_limit import TokenBucket
+
+
+class RoomRecord:
+    """Everything a node keeps about one live room"""
+
+    __slots__ = (
+        "room_id", "connections", "owner_id", "cohost_id", "controller_id", "clock", "event_log", "close_task",
+        "chat_bucket", "control_bucket", "control_pending",
+    )
+
+    def __init__(
+        self,
+        room_id: str,
+        event_log: RoomEventLog,
+        chat_bucket: TokenBucket,
+        control_bucket: TokenBucket,
+    ):
+        self.room_id = room_id
+        self.connections: Dict[str, Connection] = {}
+        self.owner_id: Optional[str] = None
+        # Takes over playback control if the owner drops
+        self.cohost_id: Optional[str] = None
+        # Set while the co-host is in control, otherwise the owner is
+        self.controller_id: Optional[str] = None
+        # None on nodes that only hold viewers of an owner connected elsewhere
+        self.clock: Optional[PlaybackClock] = None
+        # Recent sequenced broadcasts, replayed to reconnecting clients
+        self.event_log = event_log
+        # Pending close while the room waits for its owner to come back
+        self.close_task: Optional[asyncio.Task] = None
+        # Room-wide rate limits, on top of each connection's own
+        self.chat_bucket = chat_bucket
+        self.control_bucket = control_bucket
+        # Set while control events over the limit wait to go out as one playback update
+        self.control_pending = False
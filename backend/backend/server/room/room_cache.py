@@ -0,0 +1,61 @@
+import asyncio
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+from sqlmodel import Session
+
+from backend.server.db.db import engine
+from backend.server.db.single_flight import SingleFlight
+from backend.server.model.model import Room
+from backend.server.config.config import Config
+
+
+class RoomMeta(NamedTuple):
+    status: str
+    created_by: str
+    video_key: Optional[str]
+
+
+def _load_room(room_id: str) -> Optional[RoomMeta]:
+    with Session(bind=engine) as session:
+        room = session.get(Room, room_id)
+        if room is None:
+            return None
+        return RoomMeta(status=room.status, created_by=room.created_by, video_key=room.video_key)
+
+
+class RoomCache:
+    """TTL cache of the room fields websocket joins need, so joins skip the database"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, RoomMeta]] = {}
+        # One database load per room at a time, however many viewers join at once
+        self._loading = SingleFlight()
+
+    async def get(self, room_id: str, refresh: bool = False) -> Optional[RoomMeta]:
+        if not refresh:
+            entry = self._entries.get(room_id)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+        return await self._loading.do(room_id, lambda: self._load(room_id))
+
+    async def _load(self, room_id: str) -> Optional[RoomMeta]:
+        # The sync session runs in a thread so it doesn't block other sockets
+        meta = await asyncio.to_thread(_load_room, room_id)
+        if meta is not None:
+            self._entries[room_id] = (time.monotonic() + self.ttl, meta)
+        else:
+            self._entries.pop(room_id, None)
+        return meta
+
+    def set_status(self, room_id: str, status: str):
+        """Record a status change this process just wrote to the database"""
+        entry = self._entries.get(room_id)
+        if entry is not None:
+            self._entries[room_id] = (entry[0], entry[1]._replace(status=status))
+
+    def invalidate(self, room_id: str):
+        self._entries.pop(room_id, None)
+
+
+room_cache = RoomCache(ttl=Config.WS_ROOM_CACHE_TTL)
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from sqlmodel import Session
-from typing import List
+from typing import List, Optional
 
 from backend.server.db.db import get_session
 from backend.server.model.model import (
     CreateRoom,
     RoomResponse,
     AddVideoToRoom,
+    ChatHistoryResponse,
+    ChatMessageResponse,
 )
 from backend.server.room.room_service import RoomService
 
@@ -78,6 +80,27 @@ async def get_room(
         )
     return room_service._to_response(room)
 
+@router.get("/{room_id}/messages", response_model=ChatHistoryResponse)
+async def get_chat_history(
+    room_id: str,
+    before: Optional[int] = Query(None, description="Return messages older than this message id"),
+    limit: int = Query(50, ge=1, le=200),
+    room_service: RoomService = Depends(get_room_service)
+) -> ChatHistoryResponse:
+    """Get a room's chat history, newest first."""
+    room = await room_service.get_room(room_id)
+    if not room:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Room not found"
+        )
+    messages = await room_service.get_chat_history(room_id, before, limit)
+    return ChatHistoryResponse(
+        messages=[ChatMessageResponse.model_validate(message, from_attributes=True) for message in messages],
+        # Pass this back as `before` to get the next page
+        next_before=messages[-1].id if len(messages) == limit else None
+    )
+
 @router.put("/{room_id}", response_model=RoomResponse)
 async def update_room(
     request: Request,
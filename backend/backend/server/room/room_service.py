@@ -7,8 +7,10 @@ from ..model.model import (
   CreateRoom,
   RoomResponse,
   AddVideoToRoom,
-  VideoType
+  VideoType,
+  ChatMessage
 )
+from .room_cache import room_cache
 
 class RoomService:
     def __init__(self, session: Session):
@@ -51,6 +53,7 @@ class RoomService:
         room.updated_at = datetime.now().isoformat()
 
         self.session.commit()
+        room_cache.invalidate(room_id)
         self.session.refresh(room)
         return room
 
@@ -62,6 +65,7 @@ class RoomService:
 
         self.session.delete(room)
         self.session.commit()
+        room_cache.invalidate(room_id)
         return True
 
     async def add_video_to_room(self, room_id: str, data: AddVideoToRoom, user_id: str) -> Optional[Room]:
@@ -86,6 +90,7 @@ class RoomService:
         
         self.session.add(room)
         self.session.commit()
+        room_cache.invalidate(room_id)
         self.session.refresh(room)
         return room
 
@@ -101,9 +106,18 @@ class RoomService:
         
         self.session.add(room)
         self.session.commit()
+        room_cache.invalidate(room_id)
         self.session.refresh(room)
         return room
 
+    async def get_chat_history(self, room_id: str, before: Optional[int], limit: int) -> List[ChatMessage]:
+        """Get a page of chat messages, newest first, older than the `before` message id."""
+        statement = select(ChatMessage).where(ChatMessage.room_id == room_id)
+        if before is not None:
+            statement = statement.where(ChatMessage.id < before)
+        statement = statement.order_by(ChatMessage.id.desc()).limit(limit)
+        return self.session.exec(statement).all()
+
     def _to_response(self, room: Room) -> RoomResponse:
         """Convert Room model to RoomResponse."""
         return RoomResponse(
@@ -0,0 +1,55 @@
+import time
+from typing import Dict, Optional
+import redis.asyncio as aioredis
+
+from backend.server.db.redis_client import KEY_PREFIX
+from backend.server.room.playback import PlaybackClock
+
+
+def state_key(room_id: str) -> str:
+    return f"{KEY_PREFIX}:room:{room_id}:state"
+
+
+class RoomStateStore:
+    """Writes live room playback state through to Redis so a restarted or different node can resume it"""
+
+    def __init__(self, redis: aioredis.Redis, ttl: int, progress_interval: float):
+        self.redis = redis
+        self.ttl = ttl
+        self.progress_interval = progress_interval
+        self._last_write: Dict[str, float] = {}
+
+    async def save(self, room_id: str, clock: PlaybackClock, is_progress: bool = False):
+        # Progress ticks arrive constantly, only persist them every progress_interval
+        now = time.monotonic()
+        if is_progress and now - self._last_write.get(room_id, 0.0) < self.progress_interval:
+            return
+        self._last_write[room_id] = now
+
+        state = clock.to_state()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(state_key(room_id), mapping={
+                "position": state["position"],
+                "paused": int(state["paused"]),
+                "rate": state["rate"],
+                "updated_at": state["updated_at"],
+                "owner": state["owner"],
+            })
+            pipe.expire(state_key(room_id), self.ttl)
+            await pipe.execute()
+
+    async def load(self, room_id: str) -> Optional[PlaybackClock]:
+        data = await self.redis.hgetall(state_key(room_id))
+        if not data:
+            return None
+        return PlaybackClock.from_state({
+            "position": float(data["position"]),
+            "paused": data["paused"] == "1",
+            "rate": float(data.get("rate", 1.0)),
+            "updated_at": float(data["updated_at"]),
+            "owner": data["owner"],
+        })
+
+    async def delete(self, room_id: str):
+        self._last_write.pop(room_id, None)
+        await self.redis.delete(state_key(room_id))
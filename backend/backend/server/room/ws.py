@@ -1,95 +1,183 @@
 from backend.server.room.ws_manager import ConnectionManager
+from backend.server.room.codec import decode_binary
+from backend.server.room.connection import Connection
+from backend.server.room.events import (
+    ChatEvent,
+    PongEvent,
+    ReactionEvent,
+    SetCohostEvent,
+    TimeSyncEvent,
+    VideoEvent,
+    EventError,
+    parse_event,
+    validate_event,
+)
+from backend.server.room.playback import server_time_ms
+from backend.server.room.chat_writer import chat_writer
+from backend.server.room.ws_metrics import MESSAGES_IN, register_manager_gauges
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime
-from sqlalchemy.orm import Session
-from backend.server.model.model import Room
-from backend.server.db.db import engine
+from typing import Awaitable, Callable, Dict, Optional
 
 manager = ConnectionManager()
+register_manager_gauges(manager)
 
 
-async def handle_websocket(websocket: WebSocket, room_id: str, user_id: str, name: str):
+def _error(room_id: str, connection: Connection, message: str, droppable: bool = False):
+    manager.send_personal(connection, {
+        "type": "error",
+        "message": message
+    }, droppable)
+
+
+async def _on_pong(room_id: str, connection: Connection, event: PongEvent):
+    # touch() already recorded it
+    pass
+
+
+async def _on_video_event(room_id: str, connection: Connection, event: VideoEvent):
+    if not manager.can_control(room_id, connection.user_id):
+        print(f"Non-owner {connection.user_id} tried to control video")
+        _error(room_id, connection, "Only room owner can control video")
+        return
+
+    allowed = manager.allow_control(room_id, connection)
+    if not allowed and event["event_type"] == "progress":
+        # Progress only corrects drift, the next one will do
+        return
+
+    # Over the limit the clock only moves in memory, the deferred update saves it once
+    if not await manager.update_video_state(
+        room_id, event["event_type"], event["video_time"], event.get("rate"), persist=allowed
+    ):
+        _error(room_id, connection, "Invalid video time")
+        return
+
+    # Progress updates only correct the room clock, everything else is relayed
+    # with the server time so viewers can compensate for transit delay
+    if event["event_type"] != "progress":
+        if allowed:
+            message = {
+                "type": "video_event",
+                "user_id": connection.user_id,
+                "user_name": connection.name,
+                "timestamp": datetime.now().isoformat(),
+                "event_type": event["event_type"],
+                "video_time": event["video_time"],
+                "server_time": server_time_ms()
+            }
+            if event.get("rate") is not None:
+                message["rate"] = event["rate"]
+            await manager.broadcast_to_room(room_id, message, exclude_user=connection.user_id)
+        else:
+            # Over the limit the clock still moves, viewers get the
+            # net result of the burst in one update
+            manager.defer_control(room_id)
+
+
+async def _on_chat(room_id: str, connection: Connection, event: ChatEvent):
+    if not manager.allow_chat(room_id, connection):
+        _error(room_id, connection, "You are sending messages too fast", droppable=True)
+        return
+    await manager.broadcast_to_room(room_id, {
+        "type": "chat",
+        "user_id": connection.user_id,
+        "user_name": connection.name,
+        "timestamp": datetime.now().isoformat(),
+        "message": event["message"]
+    })
+    # Stored in the background, the database never slows the room down
+    chat_writer.add(room_id, connection.user_id, connection.name, event["message"])
+
+
+async def _on_reaction(room_id: str, connection: Connection, event: ReactionEvent):
+    # Counted and sent to the room as totals, never relayed one by one
+    if not manager.reactions.add(room_id, event["reaction"]):
+        _error(room_id, connection, "Invalid reaction", droppable=True)
+
+
+async def _on_set_cohost(room_id: str, connection: Connection, event: SetCohostEvent):
+    if not manager.is_room_owner(room_id, connection.user_id):
+        _error(room_id, connection, "Only room owner can choose a co-host")
+        return
+    if not await manager.set_cohost(room_id, event.get("cohost_id")):
+        _error(room_id, connection, "Invalid co-host")
+
+
+async def _on_time_sync(room_id: str, connection: Connection, event: TimeSyncEvent):
+    # Clients estimate their clock offset from the round trip
+    manager.send_personal(connection, {
+        "type": "time_sync",
+        "client_time": event.get("client_time"),
+        "server_time": server_time_ms()
+    })
+
+
+# One handler per client event type, the event is already validated
+HANDLERS: Dict[str, Callable[[str, Connection, dict], Awaitable[None]]] = {
+    "pong": _on_pong,
+    "video_event": _on_video_event,
+    "chat": _on_chat,
+    "reaction": _on_reaction,
+    "set_cohost": _on_set_cohost,
+    "time_sync": _on_time_sync,
+}
+
+
+
+async def handle_websocket(
+    websocket: WebSocket,
+    room_id: str,
+    user_id: str,
+    name: str,
+    epoch: Optional[str] = None,
+    last_seq: Optional[int] = None,
+):
+    connection = None
     try:
         print(f"Attempting to connect user {user_id} to room {room_id} with name {name}")
         
-        connection_result = await manager.connect(websocket, room_id, user_id, name)
-        if not connection_result:
-            print(f"Connection failed - manager.connect returned {connection_result}")
-            print(f"Current active connections: {manager.active_rooms}")
-            print(f"Current rooms: {manager.room_owners}")
+        connection = await manager.connect(websocket, room_id, user_id, name, epoch, last_seq)
+        if not connection:
+            print(f"Connection failed - manager.connect returned {connection}")
+            print(f"Current rooms: {list(manager.rooms.keys())}")
             return
             
         print(f"Successfully connected user {user_id} to room {room_id}")
         
         try:
             while True:
-                data = await websocket.receive_json()
-                print(f"Received data from {user_id}: {data}")
-                
-                if "type" not in data:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": "Missing event type"
-                    })
+                if connection.binary:
+                    frame = await websocket.receive_bytes()
+                else:
+                    frame = await websocket.receive_text()
+                if connection.closed:
+                    # Replaced by a reconnect or evicted, nothing more it sends counts
+                    break
+                # Any inbound frame proves the client is alive to the heartbeat reaper
+                connection.touch()
+                try:
+                    if connection.binary:
+                        event = validate_event(decode_binary(frame))
+                    else:
+                        event = parse_event(frame)
+                except EventError as e:
+                    MESSAGES_IN.labels("invalid").inc()
+                    _error(room_id, connection, str(e))
+                    continue
+                except ValueError:
+                    MESSAGES_IN.labels("invalid").inc()
+                    _error(room_id, connection, "Invalid MessagePack")
                     continue
 
-                event_type = data["type"]
-                current_time = datetime.now().isoformat()
-                message = {
-                    "type": event_type,
-                    "user_id": user_id,
-                    "user_name": name,
-                    "timestamp": current_time,
-                    **data
-                }
-
-                if event_type == "video_event":
-                    if not manager.is_room_owner(room_id, user_id):
-                        print(f"Non-owner {user_id} tried to control video")
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": "Only room owner can control video"
-                        })
-                        continue
-                        
-                    if "video_time" not in data:
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": "Missing video time"
-                        })
-                        continue
-                    
-                    print("--------------------------------")
-                    print(f"Received video event from {user_id}: {data}")
-                    print("--------------------------------")
-                    
-                    # Handle video progress updates
-                    if data.get("event_type") == "progress":
-                        video_state = data["video_time"]
-                        await manager.update_video_state(room_id, video_state)
-                    else:
-                        await manager.broadcast_to_room(room_id, message, exclude_user=user_id)
-                
-                elif event_type == "chat":
-                    if "message" not in data:
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": "Missing chat message"
-                        })
-                        continue
-                    await manager.broadcast_to_room(room_id, message)
-                
-                else:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Unknown event type: {event_type}"
-                    })
+                MESSAGES_IN.labels(event["type"]).inc()
+                await HANDLERS[event["type"]](room_id, connection, event)
 
         except WebSocketDisconnect:
-            await manager.disconnect(room_id, user_id)
+            await manager.disconnect(room_id, user_id, connection)
             
     except Exception as e:
         print(f"Error in websocket handler: {str(e)}")
-        await manager.disconnect(room_id, user_id)
+        await manager.disconnect(room_id, user_id, connection)
         raise
 
@@ -1,9 +1,29 @@
+import asyncio
+import math
+import random
+import time
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from typing import Dict, Optional, Set
 from datetime import datetime
 from backend.server.db.db import engine
 from sqlmodel import Session
 from backend.server.model.model import Room
+from backend.server.config.config import Config
+from backend.server.room.fanout import fan_out
+from backend.server.room.codec import encode, encode_binary, choose_subprotocol, msgpack, MSGPACK_SUBPROTOCOL
+from backend.server.room.connection import Connection, HEARTBEAT_TIMEOUT_CLOSE_CODE, REPLACED_CLOSE_CODE
+from backend.server.room.room_cache import room_cache
+from backend.server.room.backplane import RedisBackplane
+from backend.server.room.room_state import RoomStateStore
+from backend.server.room.playback import PlaybackClock, server_time_ms
+from backend.server.room.presence import PresenceBatcher
+from backend.server.room.reactions import ReactionAggregator
+from backend.server.room.event_log import RoomEventLog
+from backend.server.room.records import RoomRecord
+from backend.server.room.rate_limit import TokenBucket
+from backend.server.room.admission import LoopLagMonitor, deny, retry_after
+from backend.server.room.ws_metrics import FANOUT_SECONDS, JOINS, MESSAGES_OUT
+from backend.server.db.redis_client import get_redis
 
 
 
@@ -15,150 +35,387 @@ async def get_room(room_id: str):
 
 class ConnectionManager:
     def __init__(self):
-        self.active_rooms: Dict[str, Dict[str, WebSocket]] = {}
-        self.room_owners: Dict[str, str] = {}
-        self.video_states: Dict[str, str] = {}
+        # One record per live room on this node, holding its connections and playback state
+        self.rooms: Dict[str, RoomRecord] = {}
+        # Sockets registered on this node, across all rooms
+        self.connection_count = 0
+        self.loop_lag = LoopLagMonitor(Config.WS_LOOP_LAG_INTERVAL)
+        # Set once shutdown starts; no new joins, and leaving sockets don't close rooms
+        self.draining = False
+        self._heartbeat: Optional[asyncio.Task] = None
+        # Set when rooms are shared with other nodes over Redis
+        self.backplane: Optional[RedisBackplane] = None
+        # Set when playback state is written through to Redis
+        self.state_store: Optional[RoomStateStore] = None
+        # Joins and leaves go out as one batched roster diff per room
+        self.presence = PresenceBatcher(
+            window=Config.WS_PRESENCE_WINDOW,
+            broadcast_threshold=Config.WS_PRESENCE_BROADCAST_THRESHOLD,
+            broadcast=self.broadcast_to_room,
+            room_size=self.room_size,
+        )
+        self.reactions = ReactionAggregator(
+            tick=Config.WS_REACTION_TICK,
+            broadcast=self.broadcast_to_room,
+        )
 
-    async def connect(self, websocket: WebSocket, room_id: str, user_id: str, name: str):
+    async def start(self):
+        """Start background services, called from the app lifespan"""
+        if Config.WS_BACKPLANE_ENABLED:
+            self.backplane = RedisBackplane(
+                get_redis(),
+                on_frame=self._on_remote_frame,
+                on_close=self._on_remote_close,
+                key_ttl=Config.WS_BACKPLANE_KEY_TTL,
+            )
+            await self.backplane.start()
+        # Viewers joining on a node the owner isn't on get the playback position from
+        # the state store, so the backplane can't work without it
+        if Config.WS_STATE_STORE_ENABLED or Config.WS_BACKPLANE_ENABLED:
+            self.state_store = RoomStateStore(
+                get_redis(),
+                ttl=Config.WS_STATE_TTL,
+                progress_interval=Config.WS_STATE_PROGRESS_INTERVAL,
+            )
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        self.loop_lag.start()
+
+    async def stop(self):
+        self.loop_lag.stop()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        # Rooms still waiting out their owner's grace period would stay active
+        # with nobody left to close them
+        for record in [record for record in self.rooms.values() if record.close_task is not None]:
+            await self.close_room(record.room_id)
+        if self.backplane is not None:
+            await self.backplane.stop()
+            self.backplane = None
+
+    def _room(self, room_id: str) -> RoomRecord:
+        record = self.rooms.get(room_id)
+        if record is None:
+            record = self.rooms[room_id] = RoomRecord(
+                room_id,
+                RoomEventLog(
+                    max_events=Config.WS_EVENT_LOG_MAX_EVENTS,
+                    max_bytes=Config.WS_EVENT_LOG_MAX_BYTES,
+                ),
+                chat_bucket=TokenBucket(Config.WS_ROOM_CHAT_RATE, Config.WS_ROOM_CHAT_BURST),
+                control_bucket=TokenBucket(Config.WS_ROOM_CONTROL_RATE, Config.WS_ROOM_CONTROL_BURST),
+            )
+        return record
+
+    def admission_denial(self, room_id: str, user_id: str) -> Optional[str]:
+        """Why a join can't be admitted right now, or None if it can"""
+        if self.draining:
+            return "Server is restarting"
+        if self.connection_count >= Config.WS_MAX_CONNECTIONS:
+            return "Server is full"
+        record = self.rooms.get(room_id)
+        # A returning owner is let in regardless, the room is stuck without them
+        if record is not None and record.owner_id == user_id:
+            return None
+        if self.loop_lag.lag > Config.WS_LOOP_LAG_THRESHOLD:
+            # Shed new joins so the viewers already here keep smooth sync
+            return "Server is overloaded"
+        if record is not None and len(record.connections) >= Config.WS_MAX_ROOM_CONNECTIONS:
+            return "Room is full"
+        return None
+
+    def _connections(self, room_id: str) -> Dict[str, Connection]:
+        record = self.rooms.get(room_id)
+        return record.connections if record is not None else {}
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        room_id: str,
+        user_id: str,
+        name: str,
+        epoch: Optional[str] = None,
+        last_seq: Optional[int] = None,
+    ):
         try:
+            # Refuse before accepting, so a refused join costs no more than the handshake
+            denial = self.admission_denial(room_id, user_id)
+            if denial is not None:
+                print(f"Refused user {user_id} in room {room_id}: {denial}")
+                JOINS.labels("refused").inc()
+                await deny(websocket, denial, retry_after(Config.WS_ADMISSION_RETRY_AFTER))
+                return False
+
             # Accept the connection first
-            await websocket.accept()
+            # Clients opt in to MessagePack by offering its subprotocol
+            subprotocol = choose_subprotocol(websocket.scope.get("subprotocols", []))
+            await websocket.accept(subprotocol=subprotocol)
             print(f"WebSocket accepted for user {user_id}")
 
-            # Then check room status
-            with Session(bind=engine) as session:
-                room = session.get(Room, room_id)
-                if not room:
-                    print(f"Room {room_id} not found")
-                    await websocket.close(code=4000, reason="Room not found")
+            # Then check room status, from the cache so joins don't hit the database
+            room = await room_cache.get(room_id)
+            if not room:
+                print(f"Room {room_id} not found")
+                await websocket.close(code=4000, reason="Room not found")
+                return False
+
+            is_owner = room.created_by == user_id
+            connection = Connection(
+                websocket,
+                user_id,
+                max_queue=Config.WS_QUEUE_HIGH_WATER,
+                send_timeout=Config.WS_SEND_TIMEOUT,
+                on_drop=lambda conn: self._on_connection_dropped(room_id, conn),
+                name=name,
+                is_owner=is_owner,
+                binary=subprotocol == MSGPACK_SUBPROTOCOL,
+            )
+
+            # If user is the room owner
+            if is_owner:
+                print(f"Owner {user_id} connecting to room {room_id}")
+                owner_id = user_id
+                if self.backplane is not None:
+                    await self.backplane.set_owner(room_id, user_id)
+                
+                # Keep the video state if it exists, resuming from Redis after a failover
+                clock = await self._restore_video_state(room_id)
+                if clock is None:
+                    clock = PlaybackClock(owner=user_id)
+                
+                # Activate room
+                await activate_room(room_id)
+                print(f"Room {room_id} activated by owner")
+            else:
+                # Non-owner trying to join
+                print(f"Non-owner {user_id} trying to join room {room_id}")
+                # The owner may have just activated it on another node
+                if room.status != "active":
+                    room = await room_cache.get(room_id, refresh=True)
+                if room is None or room.status != "active":
+                    print(f"Room {room_id} is not active")
+                    await websocket.close(code=4000, reason="Room is inactive. Wait for owner to join.")
+                    return False
+                # The owner may be connected to another node
+                record = self.rooms.get(room_id)
+                owner_id = record.owner_id if record is not None else None
+                if owner_id is None and self.backplane is not None:
+                    owner_id = await self.backplane.get_owner(room_id)
+                # A room with saved live state survived a node restart, let viewers back in
+                clock = await self._restore_video_state(room_id)
+                if owner_id is None and clock is not None:
+                    owner_id = clock.owner
+                if owner_id is None:
+                    print(f"Room {room_id} has no active connections")
+                    await websocket.close(code=4000, reason="Room is not active. Wait for owner to join.")
                     return False
 
-                # Initialize room in active_rooms if it doesn't exist
-                if room_id not in self.active_rooms:
-                    self.active_rooms[room_id] = {}
+            # Register and queue the catch-up frames with no await in between,
+            # so no broadcast can get ahead of them and the sweeper can't drop the record
+            record = self._room(room_id)
+            record.owner_id = owner_id
+            owner_returned = is_owner and (record.close_task is not None or record.controller_id is not None)
+            if is_owner:
+                # Back within the grace period, the room carries on where it was frozen
+                self._cancel_close(record)
+                record.controller_id = None
+            if record.clock is None or (clock is not None and not self._controlled_here(record)):
+                # Nodes without the controller take the latest saved state on every join
+                record.clock = clock
+            previous = record.connections.get(user_id)
+            if previous is None:
+                self.connection_count += 1
+            record.connections[user_id] = connection
+            if previous is not None:
+                # Usually a half-open socket left behind by a network blip. It is no
+                # longer registered, so its on_drop and disconnect leave the new one alone
+                print(f"User {user_id} reconnected to room {room_id}, closing the old socket")
+                previous.abort(REPLACED_CLOSE_CODE, "Replaced by a new connection")
+            self._send_catch_up(record, connection, epoch, last_seq)
 
-                # If user is the room owner
-                if room.created_by == user_id:
-                    print(f"Owner {user_id} connecting to room {room_id}")
-                    self.active_rooms[room_id][user_id] = websocket
-                    self.room_owners[room_id] = user_id
-                    
-                    # Initialize video state if not exists
-                    if room_id not in self.video_states:
-                        self.video_states[room_id] = "0"  # Default video time
-                    
-                    # Activate room
-                    await activate_room(room_id)
-                    print(f"Room {room_id} activated by owner")
-                else:
-                    # Non-owner trying to join
-                    print(f"Non-owner {user_id} trying to join room {room_id}")
-                    if room.status != "active":
-                        print(f"Room {room_id} is not active")
-                        await websocket.close(code=4000, reason="Room is inactive. Wait for owner to join.")
-                        return False
-                    if room_id not in self.active_rooms:
-                        print(f"Room {room_id} has no active connections")
-                        await websocket.close(code=4000, reason="Room is not active. Wait for owner to join.")
-                        return False
-                    
-                    self.active_rooms[room_id][user_id] = websocket
+            # Send current video state to new user if it exists
+            try:
+                if record.clock is not None:
+                    # Where playback is right now, not where the owner last reported it
+                    clock = record.clock
+                    print(f"Sending video state to user {user_id} in room {room_id}: {clock.to_state()}")
+                    connection.send_message(_playback_event(clock, user_id, name))
+            except Exception as e:
+                print(f"Error sending video state: {str(e)}")
+                # Continue even if video state send fails
 
-                # Send current video state to new user if it exists
-           
-      
-           
-                try:
-                    print('\n')
-                    print("-------------------------------- " )
-                    print("Room ID: ", room_id)
-                    print("Sending video state to user: ", user_id, "Video state: ", self.video_states[room_id])
-                    print("--------------------------------")
-                    print('\n')
-                    if room_id in self.video_states:
-                        await websocket.send_json({
-                            "type": "video_event",
-                            "user_id": user_id,
-                            "user_name": name,
-                            "timestamp": datetime.now().isoformat(),
-                            "event_type": "play",
-                            "video_time": self.video_states[room_id]
-                        })
-                except Exception as e:
-                    print(f"Error sending video state: {str(e)}")
-                    # Continue even if video state send fails
+            if self.backplane is not None:
+                await self.backplane.join_room(room_id)
+                await self.backplane.add_member(room_id, user_id)
 
-                # Notify about new user
-                try:
-                    await self.broadcast_to_room(
-                        room_id,
-                        {
-                            "type": "join",
-                            "user_name": name,
-                            "user_id": user_id,
-                            "is_owner": room.created_by == user_id,
-                            "timestamp": datetime.now().isoformat()
-                        }
-                    )
-                except Exception as e:
-                    print(f"Error broadcasting join message: {str(e)}")
-                    # Continue even if broadcast fails
+            if owner_returned:
+                print(f"Owner {user_id} returned to room {room_id}")
+                await self.broadcast_to_room(room_id, {
+                    "type": "owner_returned",
+                    "user_id": user_id,
+                    "user_name": name,
+                    "timestamp": datetime.now().isoformat()
+                }, exclude_user=user_id)
+
+            # Notify about new user with the next presence batch
+            self.presence.joined(room_id, connection)
+            JOINS.labels("accepted").inc()
 
-                return True
+            return connection
 
         except Exception as e:
             print(f"Error in connect for room {room_id}: {str(e)}")
+            JOINS.labels("failed").inc()
             try:
                 await websocket.close(code=4000, reason="Connection error")
             except:
                 pass
             # Clean up any partial connection state
-            if room_id in self.active_rooms and user_id in self.active_rooms[room_id]:
-                del self.active_rooms[room_id][user_id]
+            connections = self._connections(room_id)
+            if user_id in connections:
+                connections.pop(user_id).abort(4000, "Connection error")
+                self.connection_count -= 1
             return False
 
-    async def disconnect(self, room_id: str, user_id: str):
+    async def disconnect(self, room_id: str, user_id: str, connection: Optional[Connection] = None):
         print(f"\n=== Disconnect Request ===")
         print(f"Room ID: {room_id}")
         print(f"User ID: {user_id}")
         
+        record = self.rooms.get(room_id)
+        if record is None:
+            return
+        # A handler for a socket that was already replaced by a reconnect must not remove the new one
+        if connection is not None and record.connections.get(user_id) is not connection:
+            return
+        
         try:
-            if room_id in self.active_rooms:
-                is_owner = self.room_owners.get(room_id) == user_id
-                print(f"Is Owner: {is_owner}")
+            is_owner = record.owner_id == user_id
+            in_control = record.controller_id == user_id
+            print(f"Is Owner: {is_owner}")
+            
+            if self.draining:
+                # The room lives on with its users on other nodes, or resumes
+                # from its saved state once this node is back
+                if user_id in record.connections:
+                    record.connections.pop(user_id).abort(1000, "Disconnected")
+                    self.connection_count -= 1
+                    if self.backplane is not None:
+                        await self.backplane.remove_member(room_id, user_id)
+                    elif is_owner and self.state_store is None:
+                        # Nothing can carry it on, don't leave it looking live after the restart
+                        await self._set_status(room_id, "inactive")
+                return
+
+            # Check if user is still in room
+            if user_id in record.connections:
+                # Stop the writer task along with the socket
+                record.connections.pop(user_id).abort(1000, "Disconnected")
+                self.connection_count -= 1
+                print(f"User removed from active room")
+                print(f"Remaining users: {len(record.connections)}")
+                if self.backplane is not None:
+                    await self.backplane.remove_member(room_id, user_id)
+                    if not record.connections:
+                        await self.backplane.leave_room(room_id)
                 
-                # Check if user is still in room
-                if user_id in self.active_rooms[room_id]:
-                    self.active_rooms[room_id].pop(user_id, None)
-                    print(f"User removed from active room")
-                    print(f"Remaining users: {list(self.active_rooms[room_id].keys())}")
+                if is_owner:
+                    await self._owner_left(record)
                     
-                    if is_owner:
-                        print("Owner disconnected - closing room")
-                        await self.close_room(room_id)
-                        
-                    else:
-                        print("Regular user disconnected - notifying others")
-                        await self.broadcast_to_room(
-                            room_id,
-                            {
-                                "type": "leave",
-                                "user_id": user_id,
-                                "message": f"User left the room",
-                                "timestamp": datetime.now().isoformat()
-                            }
-                        )
+                else:
+                    print("Regular user disconnected - notifying others")
+                    self.presence.left(room_id, user_id)
+                    if in_control:
+                        # The co-host dropped while the owner is away
+                        record.controller_id = None
+                        await self._freeze(record)
         except Exception as e:
             print(f"Error in disconnect: {str(e)}")
 
+    async def _owner_left(self, record: RoomRecord):
+        """Hand control to the co-host if there is one, otherwise freeze the room and wait for the owner"""
+        if Config.WS_OWNER_GRACE_PERIOD <= 0:
+            print("Owner disconnected - closing room")
+            await self.close_room(record.room_id)
+            return
+
+        self.presence.left(record.room_id, record.owner_id)
+        cohost = record.connections.get(record.cohost_id) if record.cohost_id is not None else None
+        if cohost is None:
+            await self._freeze(record)
+            return
+
+        print(f"Owner left room {record.room_id} - handing control to co-host {cohost.user_id}")
+        record.controller_id = cohost.user_id
+        await self.broadcast_to_room(record.room_id, {
+            "type": "control_transferred",
+            "user_id": cohost.user_id,
+            "user_name": cohost.name,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    async def _freeze(self, record: RoomRecord):
+        """Pause playback and close the room unless the owner is back within the grace period"""
+        room_id = record.room_id
+        print(f"Nobody in control of room {room_id} - holding it for {Config.WS_OWNER_GRACE_PERIOD}s")
+        clock = record.clock
+        if clock is not None:
+            clock.apply("pause", clock.current_position())
+            if self.state_store is not None:
+                try:
+                    await self.state_store.save(room_id, clock)
+                except Exception as e:
+                    print(f"Error saving video state for room {room_id}: {str(e)}")
+            await self.broadcast_to_room(room_id, _playback_event(clock, record.owner_id, ""))
+
+        await self.broadcast_to_room(room_id, {
+            "type": "owner_away",
+            "grace_period": Config.WS_OWNER_GRACE_PERIOD,
+            "timestamp": datetime.now().isoformat()
+        })
+        self._cancel_close(record)
+        record.close_task = asyncio.create_task(self._close_after_grace(room_id))
+
+    async def _close_after_grace(self, room_id: str):
+        await asyncio.sleep(Config.WS_OWNER_GRACE_PERIOD)
+        record = self.rooms.get(room_id)
+        if record is None:
+            return
+        record.close_task = None
+        if self.backplane is not None:
+            try:
+                if await self.backplane.is_member(room_id, record.owner_id):
+                    print(f"Owner is back in room {room_id} on another node")
+                    return
+            except Exception as e:
+                print(f"Error checking owner of room {room_id}: {str(e)}")
+        print(f"Owner did not return to room {room_id} - closing room")
+        await self.close_room(room_id)
+
+    def _cancel_close(self, record: RoomRecord):
+        if record.close_task is not None:
+            if record.close_task is not asyncio.current_task():
+                record.close_task.cancel()
+            record.close_task = None
+
+    async def set_cohost(self, room_id: str, cohost_id: Optional[str]) -> bool:
+        """Designate the user who takes over control when the owner drops, None to clear it"""
+        record = self.rooms.get(room_id)
+        if record is None or cohost_id == record.owner_id:
+            return False
+        record.cohost_id = cohost_id
+        await self.broadcast_to_room(room_id, {
+            "type": "cohost",
+            "cohost_id": cohost_id,
+            "timestamp": datetime.now().isoformat()
+        })
+        return True
+
     async def close_room(self, room_id: str):
-        if room_id in self.active_rooms:
+        record = self.rooms.get(room_id)
+        if record is not None:
             try:
-                with Session(bind=engine) as session:
-                    room = session.get(Room, room_id)
-                    room.status = "inactive"
-                    session.add(room)
-                    session.commit()
+                await self._set_status(room_id, "inactive")
                     
                 await self.broadcast_to_room(
                     room_id,
@@ -170,82 +427,370 @@ class ConnectionManager:
                 )
                 
                 # Clean up video state
-                if room_id in self.video_states:
-                    del self.video_states[room_id]
+                record.clock = None
+                
+                if self.state_store is not None:
+                    await self.state_store.delete(room_id)
+                
+                # Close the viewers connected to other nodes too
+                if self.backplane is not None:
+                    await self.backplane.publish_close(room_id)
+                    await self.backplane.clear_room(room_id)
                 
                 await self.close_all_connections(room_id)
             except Exception as e:
                 print(f"Error closing room {room_id}: {str(e)}")
                 
+    async def _set_status(self, room_id: str, status: str):
+        await asyncio.to_thread(_set_room_status, room_id, status)
+        room_cache.set_status(room_id, status)
+
     async def close_all_connections(self, room_id: str):
+        record = self.rooms.get(room_id)
+        if record is not None:
+            self._cancel_close(record)
+            # Each close flushes that viewer's queue first, so room_closed still arrives
+            await asyncio.gather(*(
+                connection.close(code=1000, reason="Room closed by owner")
+                for connection in list(record.connections.values())
+            ))
+            if self.rooms.get(room_id) is record:
+                del self.rooms[room_id]
+                self.connection_count -= len(record.connections)
+            self.presence.discard(room_id)
+            self.reactions.discard(room_id)
+
+            if self.backplane is not None:
+                await self.backplane.leave_room(room_id)
+    
+    async def broadcast_to_room(
+        self, room_id: str, message: dict, exclude_user: str = None, droppable: bool = False
+    ):
+        record = self.rooms.get(room_id)
+        if record is not None:
+            start = time.perf_counter()
+            frame = encode(message)
+            # Encode once and queue the same frame for every viewer; each
+            # connection's writer sends it, so one slow socket can't hold up the rest.
+            # Droppable frames (reaction totals, pings) are the first thing a full queue sheds and
+            # aren't worth replaying, everything else is sequenced into the room log.
+            # Connections that can't take the frame clean themselves up via on_drop.
+            failed = fan_out(
+                record.connections,
+                frame if droppable else record.event_log.append(frame, exclude_user),
+                exclude_user=exclude_user,
+                droppable=droppable,
+            )
+            FANOUT_SECONDS.observe(time.perf_counter() - start)
+            recipients = len(record.connections) - (exclude_user in record.connections)
+            MESSAGES_OUT.labels(message["type"]).inc(recipients - len(failed))
+
+            # Other nodes fan the same frame out to their own sockets
+            if self.backplane is not None:
+                try:
+                    await self.backplane.publish(room_id, frame, exclude_user, droppable)
+                except Exception as e:
+                    print(f"Error publishing to backplane for room {room_id}: {str(e)}")
+
+    def _on_remote_frame(self, room_id: str, frame: str, exclude_user: Optional[str], droppable: bool):
+        """Deliver a frame published by another node to the local sockets"""
+        record = self.rooms.get(room_id)
+        if record is not None:
+            # Each node sequences the room's events in its own log
+            if not droppable:
+                frame = record.event_log.append(frame, exclude_user)
+            failed = fan_out(record.connections, frame, exclude_user=exclude_user, droppable=droppable)
+            # The type isn't worth decoding the frame for
+            recipients = len(record.connections) - (exclude_user in record.connections)
+            MESSAGES_OUT.labels("remote").inc(recipients - len(failed))
+
+    def _send_catch_up(self, record: RoomRecord, connection: Connection, epoch: Optional[str], last_seq: Optional[int]):
+        """Replay missed events to a reconnecting client, or send a snapshot marker if they're gone"""
+        log = record.event_log
+        missed = log.since(epoch, last_seq, connection.user_id)
+        # A replay that would overflow the outbound queue is worse than a snapshot
+        if missed is not None and len(missed) < connection.max_queue // 2:
+            for frame in missed:
+                connection.send_json_frame(frame)
+            connection.send_message({
+                "type": "resume",
+                "epoch": log.epoch,
+                "seq": log.seq,
+                "replayed": len(missed)
+            })
+        else:
+            # Current playback follows as a video_event
+            connection.send_message({
+                "type": "snapshot",
+                "epoch": log.epoch,
+                "seq": log.seq,
+                "viewer_count": len(record.connections)
+            })
+
+    async def _on_remote_close(self, room_id: str):
+        """The owner's node closed the room, drop the viewers connected here"""
+        await self.close_all_connections(room_id)
+
+    async def room_size(self, room_id: str) -> int:
+        """Number of users in a room across all nodes"""
+        if self.backplane is not None:
+            return await self.backplane.member_count(room_id)
+        return len(self._connections(room_id))
+
+    def send_personal(self, connection: Connection, message: dict, droppable: bool = False) -> bool:
+        """Queue a message for a single connection, not whichever socket its user has open now"""
+        if connection.closed:
+            return False
+        MESSAGES_OUT.labels(message["type"]).inc()
+        return connection.send_message(message, droppable)
+
+    def allow_chat(self, room_id: str, connection: Connection) -> bool:
+        """Charge a chat message to the sender's and the room's budgets"""
+        record = self.rooms.get(room_id)
+        if record is None:
+            return False
+        if connection.chat_bucket is None:
+            connection.chat_bucket = TokenBucket(Config.WS_CHAT_RATE, Config.WS_CHAT_BURST)
+        now = time.monotonic()
+        return connection.chat_bucket.take(now) and record.chat_bucket.take(now)
+
+    def allow_control(self, room_id: str, connection: Connection) -> bool:
+        """Charge a video event to the sender's and the room's budgets"""
+        record = self.rooms.get(room_id)
+        if record is None:
+            return False
+        if connection.control_bucket is None:
+            connection.control_bucket = TokenBucket(Config.WS_CONTROL_RATE, Config.WS_CONTROL_BURST)
+        now = time.monotonic()
+        return connection.control_bucket.take(now) and record.control_bucket.take(now)
+
+    def defer_control(self, room_id: str):
+        """Send the room's playback state once the control budget refills, in place of the events over it"""
+        record = self.rooms.get(room_id)
+        if record is None or record.control_pending:
+            return
+        record.control_pending = True
+        asyncio.get_running_loop().call_later(
+            1.0 / Config.WS_ROOM_CONTROL_RATE,
+            lambda: asyncio.create_task(self._flush_control(room_id)),
+        )
+
+    async def _flush_control(self, room_id: str):
+        record = self.rooms.get(room_id)
+        if record is None or not record.control_pending:
+            return
+        record.control_pending = False
+        if record.clock is None:
+            return
+        if self.state_store is not None:
+            try:
+                await self.state_store.save(room_id, record.clock)
+            except Exception as e:
+                print(f"Error saving video state for room {room_id}: {str(e)}")
+        # Relative seeks can't be merged, the net result of the burst is where the clock is now
+        controller_id = record.controller_id or record.owner_id
+        controller = record.connections.get(controller_id)
+        await self.broadcast_to_room(
+            room_id,
+            _playback_event(record.clock, controller_id, controller.name if controller is not None else ""),
+            exclude_user=controller_id,
+        )
+
+    def _on_connection_dropped(self, room_id: str, connection: Connection):
+        """Disconnect a user whose socket failed or fell too far behind"""
+        # Ignore stale connections that were already replaced by a reconnect
+        if self._connections(room_id).get(connection.user_id) is connection:
+            asyncio.create_task(self.disconnect(room_id, connection.user_id, connection))
     
-        if room_id in self.active_rooms:
-           
-            for user_id ,ws in self.active_rooms[room_id].items():
-                await ws.close(
-                    code=1000,
-                    reason="Room closed by owner"
-                )
-            self.active_rooms.pop(room_id, None)
-            self.room_owners.pop(room_id, None)
-            
-            if room_id in self.room_owners:
-                self.room_owners.pop(room_id, None)
     
-    async def broadcast_to_room(self, room_id: str, message: dict, exclude_user: str = None):
-        if room_id in self.active_rooms:
-            disconnected_users = []
-            for user_id, connection in self.active_rooms[room_id].items():
-                if exclude_user != user_id:
+    async def drain(self, window: float):
+        """Shut down without a reconnect stampede: refuse joins, save room state,
+        then tell clients to reconnect elsewhere and close them in batches over window seconds"""
+        if self.draining:
+            return
+        self.draining = True
+        connections = [
+            (room_id, connection)
+            for room_id, record in self.rooms.items()
+            for connection in record.connections.values()
+        ]
+        print(f"Draining {len(connections)} websockets over {window}s")
+
+        if self.state_store is not None:
+            for room_id, record in list(self.rooms.items()):
+                # Viewer-only nodes hold a copy that may be behind the controller's node
+                if record.clock is not None and self._controlled_here(record):
                     try:
-                        print("--------------------------------")
-                        print("Sending Message to user: ", user_id, "Message: ", message)
-                        print("--------------------------------")
-                        await connection.send_json(message)
+                        await self.state_store.save(room_id, record.clock)
                     except Exception as e:
-                        disconnected_users.append(user_id)
-            
-            # Clean up disconnected users
-            for user_id in disconnected_users:
-                await self.disconnect(room_id, user_id)
-    
-    
+                        print(f"Error saving video state for room {room_id}: {str(e)}")
+
+        jitter_ms = int(Config.WS_DRAIN_RECONNECT_JITTER * 1000)
+        for _, connection in connections:
+            connection.send_message({
+                "type": "reconnect",
+                "delay_ms": random.randint(0, jitter_ms)
+            })
+
+        batches = max(1, math.ceil(len(connections) / Config.WS_DRAIN_BATCH_SIZE))
+        for i in range(batches):
+            batch = connections[i * Config.WS_DRAIN_BATCH_SIZE:(i + 1) * Config.WS_DRAIN_BATCH_SIZE]
+            # 1012: service restart
+            await asyncio.gather(*(
+                connection.close(code=1012, reason="Server restarting") for _, connection in batch
+            ))
+            if i < batches - 1:
+                await asyncio.sleep(window / batches)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(Config.WS_HEARTBEAT_INTERVAL)
+            try:
+                await self.reap()
+            except Exception as e:
+                print(f"Error in heartbeat: {str(e)}")
+
+    async def reap(self):
+        """Ping live clients, evict the ones that stopped answering and sweep empty rooms"""
+        deadline = time.monotonic() - Config.WS_HEARTBEAT_TIMEOUT
+        message = {"type": "ping", "server_time": server_time_ms()}
+        ping = encode(message)
+        binary_ping = encode_binary(message) if msgpack is not None else None
+        stale = []
+        for record in self.rooms.values():
+            for connection in record.connections.values():
+                if connection.last_seen < deadline:
+                    stale.append((record.room_id, connection))
+                else:
+                    # Any frame back counts as a pong; a ping is not worth evicting anyone for
+                    connection.send(binary_ping if connection.binary else ping, droppable=True)
+
+        # Evict in batches, yielding in between so live sockets keep flowing
+        for i in range(0, len(stale), Config.WS_REAPER_BATCH_SIZE):
+            for room_id, connection in stale[i:i + Config.WS_REAPER_BATCH_SIZE]:
+                print(f"Heartbeat timeout for user {connection.user_id} in room {room_id}")
+                # on_drop disconnects the user
+                connection.abort(HEARTBEAT_TIMEOUT_CLOSE_CODE, "Heartbeat timeout")
+            await asyncio.sleep(0)
+
+        # Rooms waiting out an owner's grace period are closed by their own task
+        for room_id in [
+            room_id for room_id, record in self.rooms.items()
+            if not record.connections and record.close_task is None
+        ]:
+            await self._sweep_room(room_id)
+
+    async def _sweep_room(self, room_id: str):
+        """Forget a room nobody on this node is connected to"""
+        self.rooms.pop(room_id, None)
+        self.presence.discard(room_id)
+        self.reactions.discard(room_id)
+        if self.backplane is not None:
+            await self.backplane.leave_room(room_id)
+
     def is_room_owner(self, room_id: str, user_id: str) -> bool:
         """Check if user is the room owner"""
-        return self.room_owners.get(room_id) == user_id
+        record = self.rooms.get(room_id)
+        return record is not None and record.owner_id == user_id
 
-    async def update_video_state(self, room_id: str, state: dict):
-        """Update video state for a room"""
-        self.video_states[room_id] = state
+    def can_control(self, room_id: str, user_id: str) -> bool:
+        """Check if user may control playback: the owner, or the co-host while the owner is away"""
+        record = self.rooms.get(room_id)
+        return record is not None and (record.controller_id or record.owner_id) == user_id
 
+    async def update_video_state(
+        self, room_id: str, event_type: str, video_time, rate=None, persist: bool = True
+    ) -> bool:
+        """Update video state for a room, writing it through to Redis unless persist is False"""
+        record = self.rooms.get(room_id)
+        clock = record.clock if record is not None else None
+        if clock is None:
+            return False
+        try:
+            video_time = float(video_time)
+            rate = float(rate) if rate is not None else None
+        except (TypeError, ValueError):
+            return False
+        clock.apply(event_type, video_time, rate)
 
-async def activate_room(room_id: str):
+        if persist and self.state_store is not None:
+            try:
+                await self.state_store.save(room_id, clock, is_progress=event_type == "progress")
+            except Exception as e:
+                print(f"Error saving video state for room {room_id}: {str(e)}")
+        return True
+
+    def _controlled_here(self, record: RoomRecord) -> bool:
+        """Whether whoever drives playback is connected to this node, so its clock is authoritative"""
+        return (record.controller_id or record.owner_id) in record.connections
+
+    async def _restore_video_state(self, room_id: str) -> Optional[PlaybackClock]:
+        """Video state for a room: the local clock if playback is driven from this node,
+        otherwise the latest state saved to Redis, since relayed events don't move the local clock"""
+        record = self.rooms.get(room_id)
+        local = record.clock if record is not None else None
+        if local is not None and (self.state_store is None or self._controlled_here(record)):
+            return local
+        if self.state_store is None:
+            return None
+        try:
+            clock = await self.state_store.load(room_id)
+        except Exception as e:
+            print(f"Error loading video state for room {room_id}: {str(e)}")
+            return local
+        if clock is None:
+            return local
+        print(f"Restored video state for room {room_id}: {clock.to_state()}")
+        return clock
+
+
+def _playback_event(clock: PlaybackClock, user_id: str, user_name: str) -> dict:
+    """A video_event that puts a client at the clock's current position and state"""
+    return {
+        "type": "video_event",
+        "user_id": user_id,
+        "user_name": user_name,
+        "timestamp": datetime.now().isoformat(),
+        "event_type": "pause" if clock.paused else "play",
+        "video_time": clock.current_position(),
+        "rate": clock.rate,
+        "server_time": server_time_ms()
+    }
+
+
+def _set_room_status(room_id: str, status: str) -> bool:
     with Session(bind=engine) as session:
         room = session.get(Room, room_id)
         if room is None:
             return False
         
         try:
-            room.status = "active"
+            room.status = status
             session.add(room)
             session.commit()
             return True
         except Exception as e:
-            print(f"Error activating room: {str(e)}")
+            print(f"Error updating room status: {str(e)}")
             session.rollback()
             return False
 
+async def activate_room(room_id: str):
+    # Owner reconnects to an already active room don't need a write. Owner joins
+    # are rare, so read through in case another node closed the room meanwhile
+    room = await room_cache.get(room_id, refresh=True)
+    if room is None:
+        return False
+    if room.status == "active":
+        return True
+    
+    activated = await asyncio.to_thread(_set_room_status, room_id, "active")
+    if activated:
+        room_cache.set_status(room_id, "active")
+    return activated
+
 async def get_room_owner(room_id: str):
-    with Session(bind=engine) as session:
-        room = session.get(Room, room_id)
-        if room is None:
-            return None
-        
-        try:
-            session.refresh(room)
-            return room.owner_id
-        except Exception as e:
-            print(f"Error refreshing room: {str(e)}")
-            # If refresh fails, try to get owner_id directly
-            return room.owner_id if room else None
+    room = await room_cache.get(room_id)
+    if room is None:
+        return None
+    return room.created_by
 
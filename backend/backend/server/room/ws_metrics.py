@@ -0,0 +1,70 @@
+from backend.server.metrics.metrics import registry
+
+# Realtime tier metrics. Gauges over the manager's state are registered by
+# register_manager_gauges and read at scrape time, not kept up to date.
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+ROOM_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+MESSAGES_IN = registry.counter(
+    "syncstream_ws_messages_in", "Frames received from clients, by event type", ("type",)
+)
+MESSAGES_OUT = registry.counter(
+    "syncstream_ws_messages_out", "Frames queued to clients, by event type", ("type",)
+)
+FANOUT_SECONDS = registry.histogram(
+    "syncstream_ws_fanout_seconds", "Time to encode a broadcast and queue it for the whole room", LATENCY_BUCKETS
+)
+SEND_SECONDS = registry.histogram(
+    "syncstream_ws_send_seconds", "Time to write one frame to one socket", LATENCY_BUCKETS
+)
+SEND_FAILURES = registry.counter(
+    "syncstream_ws_send_failures", "Connections dropped because sending to them failed", ("reason",)
+)
+FRAMES_SHED = registry.counter(
+    "syncstream_ws_frames_shed", "Droppable frames discarded from full outbound queues"
+)
+JOINS = registry.counter(
+    "syncstream_ws_joins", "Websocket join attempts, by outcome", ("result",)
+)
+
+
+def register_manager_gauges(manager):
+    """Expose a ConnectionManager's live state, read on each scrape"""
+
+    def queue_depths():
+        total = deepest = 0
+        for record in manager.rooms.values():
+            for connection in record.connections.values():
+                depth = len(connection.queue)
+                total += depth
+                deepest = max(deepest, depth)
+        return {("total",): total, ("max",): deepest}
+
+    registry.gauge(
+        "syncstream_ws_connections", "Websockets open on this node",
+        lambda: {(): manager.connection_count},
+    )
+    # Sizes are bucketed rather than labelled by room id, so series don't grow with the rooms
+    registry.gauge_histogram(
+        "syncstream_ws_room_connections", "Websockets open on this node per live room",
+        ROOM_SIZE_BUCKETS,
+        lambda: [len(record.connections) for record in manager.rooms.values()],
+    )
+    registry.gauge(
+        "syncstream_ws_largest_room_connections", "Websockets open on this node in its busiest room",
+        lambda: {(): max((len(record.connections) for record in manager.rooms.values()), default=0)},
+    )
+    registry.gauge(
+        "syncstream_ws_rooms", "Live rooms on this node",
+        lambda: {(): len(manager.rooms)},
+    )
+    registry.gauge(
+        "syncstream_ws_queued_frames", "Frames waiting in outbound queues, summed and for the deepest queue",
+        queue_depths,
+        ("stat",),
+    )
+    registry.gauge(
+        "syncstream_event_loop_lag_seconds", "How late the event loop runs timers",
+        lambda: {(): manager.loop_lag.lag},
+    )
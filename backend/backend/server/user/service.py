@@ -2,8 +2,9 @@ from fastapi import HTTPException
 from sqlmodel import select
 from .model import  UserCreate
 from sqlmodel.ext.asyncio.session import AsyncSession
-from passlib.hash import bcrypt
 from backend.server.model.model import User
+from backend.server.auth.user_cache import user_cache
+from backend.server.auth.hashing import password_hasher
 
 
 class UserService:
@@ -29,7 +30,7 @@ class UserService:
                 detail="Username or email already exists"
             )
         
-        hashed_password = bcrypt.hash(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         
         new_user = User(
             username=user.username,
@@ -92,7 +93,8 @@ class UserService:
             )
         
         session.delete(user)
-        await session.commit()
+        session.commit()
+        await user_cache.invalidate(user_id)
         
         return {"message": "User deleted successfully"}
     
@@ -118,11 +120,12 @@ class UserService:
         
         existing_user.username = user.username
         existing_user.email = user.email
-        existing_user.hashed_password = bcrypt.hash(user.password)
+        existing_user.hashed_password = await password_hasher.hash(user.password)
         
         session.add(existing_user)
         session.commit()
         session.refresh(existing_user)
+        await user_cache.invalidate(user_id)
         
         return {
             "id": existing_user.id,
@@ -113,6 +113,8 @@ export const YouTubePlayer = ({
         controls={true}
         playing={false}
         muted={true}
+        // The server extrapolates playback, progress only corrects drift
+        progressInterval={5000}
         onReady={() => setIsReady(true)}
         onPlay={handlePlay}
         onPause={handlePause}
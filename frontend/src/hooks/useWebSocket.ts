@@ -23,9 +23,71 @@ export interface VideoEvent {
     | "progress";
   video_time: number;
   timestamp: string;
+  server_time?: number;
 }
 
-type Message = ChatMessage | VideoEvent;
+interface TimeSyncMessage {
+  type: "time_sync";
+  client_time: number;
+  server_time: number;
+}
+
+interface PresenceMessage {
+  type: "presence";
+  joined: { user_id: string; user_name: string; is_owner: boolean }[];
+  left: string[];
+  viewer_count: number;
+  timestamp: string;
+}
+
+interface PingMessage {
+  type: "ping";
+  server_time: number;
+}
+
+// The server is shutting down, reconnect after the given delay
+interface ReconnectMessage {
+  type: "reconnect";
+  delay_ms: number;
+}
+
+// Reaction totals for the room since the last tick
+export interface ReactionsMessage {
+  type: "reactions";
+  counts: Record<string, number>;
+  timestamp: string;
+}
+
+// The host dropped or came back, or playback control moved to the co-host
+interface HostMessage {
+  type: "owner_away" | "owner_returned" | "control_transferred";
+  user_id?: string;
+  user_name?: string;
+  grace_period?: number;
+  timestamp: string;
+}
+
+// Sent on connect: where the replay of missed events ended, or a fresh snapshot
+interface SyncMessage {
+  type: "resume" | "snapshot";
+  epoch: string;
+  seq: number;
+}
+
+type Message = (
+  | ChatMessage
+  | VideoEvent
+  | TimeSyncMessage
+  | PresenceMessage
+  | SyncMessage
+  | PingMessage
+  | HostMessage
+  | ReactionsMessage
+  | ReconnectMessage
+) & { seq?: number };
+
+// Messages that show up in the chat list
+const CHAT_TYPES = ["chat", "join", "leave", "error", "room_closed"];
 
 export const useWebSocket = (
   roomId: string,
@@ -41,11 +103,27 @@ export const useWebSocket = (
   const videoEventCallbackRef = useRef<((event: VideoEvent) => void) | null>(
     null
   );
+  const reactionsCallbackRef = useRef<
+    ((message: ReactionsMessage) => void) | null
+  >(null);
 
   const retryCountRef = useRef(0);
 
+  // Server clock minus local clock in ms, learned from time_sync round trips
+  const clockOffsetRef = useRef(0);
+
+  // Names of users in the room, so batched leaves can be shown by name
+  const rosterRef = useRef<Map<string, string>>(new Map());
+
+  // Last room event seen, so a reconnect only replays what was missed
+  const epochRef = useRef<string | null>(null);
+  const lastSeqRef = useRef(0);
+
   const intentionalDisconnectRef = useRef(false);
 
+  // Set when the server asked us to come back after a delay of its choosing
+  const reconnectDelayRef = useRef<number | null>(null);
+
   const connect = useCallback(() => {
     if (wsRef.current?.readyState === WebSocket.OPEN) return;
     if (!userId || !userName)
@@ -59,8 +137,11 @@ export const useWebSocket = (
       return;
     }
 
+    const resume = epochRef.current
+      ? `&epoch=${epochRef.current}&last_seq=${lastSeqRef.current}`
+      : "";
     const ws = new WebSocket(
-      `${config.WS_URL}/${roomId}?user_id=${userId}&name=${userName}`
+      `${config.WS_URL}/${roomId}?user_id=${userId}&name=${userName}${resume}`
     );
 
     wsRef.current = ws;
@@ -68,6 +149,7 @@ export const useWebSocket = (
     ws.onopen = () => {
       setIsConnected(true);
       retryCountRef.current = 0;
+      ws.send(JSON.stringify({ type: "time_sync", client_time: Date.now() }));
       toast.success("Connected to chat");
     };
 
@@ -75,11 +157,69 @@ export const useWebSocket = (
       const message = JSON.parse(event.data) as Message;
       console.log("Received message:", message);
 
-      if (message.type === "video_event") {
-        // Handle video events
+      if (message.seq !== undefined) {
+        // Skip anything a replay already delivered
+        if (message.seq <= lastSeqRef.current) return;
+        lastSeqRef.current = message.seq;
+      }
+
+      if (message.type === "ping") {
+        // Heartbeat, the server drops clients that stop answering
+        ws.send(JSON.stringify({ type: "pong" }));
+      } else if (message.type === "resume" || message.type === "snapshot") {
+        epochRef.current = message.epoch;
+        lastSeqRef.current = message.seq;
+      } else if (message.type === "time_sync") {
+        // Assume the reply took half the round trip
+        const now = Date.now();
+        clockOffsetRef.current =
+          message.server_time - (message.client_time + now) / 2;
+      } else if (message.type === "video_event") {
+        // Handle video events, moving playing positions forward by the time in flight
         console.log("Video event:", message);
+        if (message.server_time && message.event_type === "play") {
+          const elapsed =
+            (Date.now() + clockOffsetRef.current - message.server_time) / 1000;
+          message.video_time = Number(message.video_time) + Math.max(0, elapsed);
+        }
         videoEventCallbackRef.current?.(message as VideoEvent);
-      } else {
+      } else if (message.type === "presence") {
+        // Show a batched roster diff as the individual join/leave lines
+        const left = message.left.map((id) => {
+          const entry: ChatMessage = {
+            type: "leave",
+            user_id: id,
+            user_name: rosterRef.current.get(id) ?? "A user",
+            message: "",
+            timestamp: message.timestamp,
+          };
+          rosterRef.current.delete(id);
+          return entry;
+        });
+        const joined = message.joined.map((user): ChatMessage => {
+          rosterRef.current.set(user.user_id, user.user_name);
+          return {
+            type: "join",
+            user_id: user.user_id,
+            user_name: user.user_name,
+            message: "",
+            timestamp: message.timestamp,
+          };
+        });
+        setMessages((prev) => [...prev, ...left, ...joined]);
+      } else if (message.type === "reconnect") {
+        reconnectDelayRef.current = message.delay_ms;
+      } else if (message.type === "reactions") {
+        reactionsCallbackRef.current?.(message);
+      } else if (message.type === "owner_away") {
+        toast.info(
+          `The host disconnected, the room stays open for ${message.grace_period}s`
+        );
+      } else if (message.type === "owner_returned") {
+        toast.success("The host is back");
+      } else if (message.type === "control_transferred") {
+        toast.info(`${message.user_name} is now controlling playback`);
+      } else if (CHAT_TYPES.includes(message.type)) {
         // Handle chat messages
         setMessages((prev) => [...prev, message as ChatMessage]);
       }
@@ -87,12 +227,19 @@ export const useWebSocket = (
 
     ws.onclose = () => {
       setIsConnected(false);
-      if (!intentionalDisconnectRef.current) {
-        console.log("Reconnecting to chat");
-        retryCountRef.current += 1;
-        toast.error("Disconnected from the room reconnecting...");
-        setTimeout(connect, 3000);
+      if (intentionalDisconnectRef.current) return;
+      const delay = reconnectDelayRef.current;
+      reconnectDelayRef.current = null;
+      if (delay !== null) {
+        // A planned restart, not a failure; the delay spreads everyone's reconnects out
+        toast.info("Server restarting, reconnecting...");
+        setTimeout(connect, delay);
+        return;
       }
+      console.log("Reconnecting to chat");
+      retryCountRef.current += 1;
+      toast.error("Disconnected from the room reconnecting...");
+      setTimeout(connect, 3000);
     };
 
     ws.onerror = (error) => {
@@ -175,11 +322,26 @@ export const useWebSocket = (
     videoEventCallbackRef.current = callback;
   }, []);
 
+  const sendReaction = useCallback((reaction: string) => {
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: "reaction", reaction }));
+    }
+  }, []);
+
+  const onReactions = useCallback(
+    (callback: (message: ReactionsMessage) => void) => {
+      reactionsCallbackRef.current = callback;
+    },
+    []
+  );
+
   return {
     messages,
     isConnected,
     sendMessage,
     sendVideoEvent,
     onVideoEvent,
+    sendReaction,
+    onReactions,
   };
 };